@@ -1,6 +1,7 @@
 import copy
 import logging
 import os
+import shlex
 import sys
 
 import yaml
@@ -14,6 +15,11 @@ import yaml
 # FILTER_FILE       File filter
 # FILTER_TEST       Test name filter
 # RELEASE_TEST_SUITE Release test suite (e.g. manual, nightly)
+# RELEASE_PREBUILD  If "1", add a step that registers and builds all app
+#                   configs of the suite ahead of the tests
+# RELEASER_HOST_CACHE_DIR  Dir on the agent host that is mounted into every
+#                   step as the releaser cache (wheel index, git mirrors,
+#                   resource registry), so steps share warm caches
 
 
 class ReleaseTest:
@@ -177,6 +183,10 @@ SUITES = {
     "manual": MANUAL_TESTS,
 }
 
+RELEASER_HOST_CACHE_DIR = os.environ.get("RELEASER_HOST_CACHE_DIR",
+                                         "/tmp/releaser-cache")
+RELEASER_CACHE_DIR = "/releaser-cache"
+
 DEFAULT_STEP_TEMPLATE = {
     "env": {
         "ANYSCALE_CLOUD_ID": "cld_4F7k8814aZzGG8TNUGPKnc",
@@ -185,7 +195,8 @@ DEFAULT_STEP_TEMPLATE = {
         "RELEASE_AWS_LOCATION": "dev",
         "RELEASE_AWS_DB_NAME": "ray_ci",
         "RELEASE_AWS_DB_TABLE": "release_test_result",
-        "AWS_REGION": "us-west-2"
+        "AWS_REGION": "us-west-2",
+        "RELEASER_CACHE_DIR": RELEASER_CACHE_DIR
     },
     "agents": {
         "queue": "runner_queue_branch"
@@ -193,7 +204,8 @@ DEFAULT_STEP_TEMPLATE = {
     "plugins": [{
         "docker#v3.8.0": {
             "image": "rayproject/ray",
-            "propagate-environment": True
+            "propagate-environment": True,
+            "volumes": [f"{RELEASER_HOST_CACHE_DIR}:{RELEASER_CACHE_DIR}"]
         }
     }],
     "commands": []
@@ -275,6 +287,36 @@ def build_pipeline(steps):
     return all_steps
 
 
+def prebuild_pipeline(test_suite: str):
+    step_conf = copy.deepcopy(DEFAULT_STEP_TEMPLATE)
+
+    RAY_BRANCH = os.environ.get("RAY_BRANCH", "master")
+    RAY_REPO = os.environ.get("RAY_REPO",
+                              "https://github.com/ray-project/ray.git")
+
+    RAY_TEST_BRANCH = os.environ.get("RAY_TEST_BRANCH", RAY_BRANCH)
+    RAY_TEST_REPO = os.environ.get("RAY_TEST_REPO", RAY_REPO)
+
+    # Only prebuild for the tests the pipeline runs
+    FILTER_FILE = os.environ.get("FILTER_FILE", "")
+    FILTER_TEST = os.environ.get("FILTER_TEST", "")
+
+    cmd = f"python e2e.py --ray-branch {RAY_BRANCH} --prebuild {test_suite}"
+    if FILTER_FILE:
+        cmd += f" --filter-file {shlex.quote(FILTER_FILE)}"
+    if FILTER_TEST:
+        cmd += f" --filter-test {shlex.quote(FILTER_TEST)}"
+
+    step_conf["commands"] = [
+        "pip install -q -r requirements.txt",
+        "pip install -U boto3 botocore",
+        f"git clone -b {RAY_TEST_BRANCH} {RAY_TEST_REPO} ~/ray",
+        cmd,
+    ]
+    step_conf["label"] = f"Prebuild app configs ({test_suite})"
+    return [step_conf]
+
+
 def alert_pipeline(stats: bool = False):
     step_conf = copy.deepcopy(DEFAULT_STEP_TEMPLATE)
 
@@ -302,4 +344,11 @@ if __name__ == "__main__":
 
         steps = build_pipeline(PIPELINE_SPEC)
 
+        if os.environ.get("RELEASE_PREBUILD", "0") == "1":
+            # Test steps only start once all app configs are registered and
+            # their builds kicked off. This doesn't wait for the builds. If
+            # the prebuild fails, tests still register their own configs.
+            wait_step = {"wait": None, "continue_on_failure": True}
+            steps = prebuild_pipeline(TEST_SUITE) + [wait_step] + steps
+
     yaml.dump({"steps": steps}, sys.stdout)
@@ -0,0 +1,188 @@
+"""
+Storage for release test artifacts and logs.
+
+`S3ArtifactStore` uploads to the release bucket with one shared client
+and multipart transfers for large files. `LocalArtifactStore` keeps the
+same layout in a local directory (set ``RELEASE_ARTIFACT_DIR`` to use it),
+e.g. to test artifact handling without AWS access.
+
+Artifacts are content addressed: `BlobStore` keeps each distinct file
+once under ``<blob prefix>/<sha256>`` and skips the upload if the blob
+already exists. A test run only stores a small manifest mapping artifact
+names to their blobs (see `BlobStore.put_manifest`).
+
+`ArtifactUploader` uploads many files concurrently through a bounded
+thread pool.
+"""
+import json
+import logging
+import os
+import tempfile
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Dict
+
+import boto3
+from boto3.s3.transfer import TransferConfig
+from botocore.exceptions import ClientError
+
+from cache_files import copy_file, file_hash
+
+logger = logging.getLogger(__name__)
+
+# Number of files uploaded at once.
+UPLOAD_WORKERS = int(os.environ.get("RELEASE_ARTIFACT_UPLOAD_WORKERS", "8"))
+
+# Files above the threshold are uploaded in parts, several at a time.
+MULTIPART_THRESHOLD = 16 * 1024 * 1024
+MULTIPART_CHUNKSIZE = 16 * 1024 * 1024
+MULTIPART_CONCURRENCY = 4
+
+
+class ArtifactStore:
+    """Storage holding artifacts under string keys."""
+
+    def upload(self, local_file: str, key: str) -> str:
+        """Store `local_file` under `key` and return its URL."""
+        raise NotImplementedError
+
+    def exists(self, key: str) -> bool:
+        raise NotImplementedError
+
+    def url(self, key: str) -> str:
+        raise NotImplementedError
+
+
+class S3ArtifactStore(ArtifactStore):
+    def __init__(self, bucket: str, client=None):
+        self.bucket = bucket
+        # boto3 clients are thread safe, so all uploads share one client
+        # and its connection pool.
+        self.client = client or boto3.client("s3")
+        self.transfer_config = TransferConfig(
+            multipart_threshold=MULTIPART_THRESHOLD,
+            multipart_chunksize=MULTIPART_CHUNKSIZE,
+            max_concurrency=MULTIPART_CONCURRENCY)
+
+    def upload(self, local_file: str, key: str) -> str:
+        self.client.upload_file(
+            local_file, self.bucket, key, Config=self.transfer_config)
+        return self.url(key)
+
+    def exists(self, key: str) -> bool:
+        try:
+            self.client.head_object(Bucket=self.bucket, Key=key)
+        except ClientError as e:
+            if e.response["Error"]["Code"] in ("404", "NoSuchKey", "NotFound"):
+                return False
+            raise
+        return True
+
+    def url(self, key: str) -> str:
+        return f"s3://{self.bucket}/{key}"
+
+
+class LocalArtifactStore(ArtifactStore):
+    def __init__(self, root: str):
+        self.root = os.path.abspath(os.path.expanduser(root))
+
+    def upload(self, local_file: str, key: str) -> str:
+        path = self.url(key)
+        copy_file(local_file, path)
+        return path
+
+    def exists(self, key: str) -> bool:
+        return os.path.exists(self.url(key))
+
+    def url(self, key: str) -> str:
+        return os.path.join(self.root, key)
+
+
+def default_artifact_store(bucket: str) -> ArtifactStore:
+    local_dir = os.environ.get("RELEASE_ARTIFACT_DIR")
+    if local_dir:
+        return LocalArtifactStore(local_dir)
+    return S3ArtifactStore(bucket)
+
+
+class BlobStore:
+    """Content addressed view of an artifact store.
+
+    Blobs never change once stored, so blobs known to exist are
+    remembered for the lifetime of the process and not checked again.
+    """
+
+    def __init__(self, store: ArtifactStore, prefix: str):
+        self.store = store
+        self.prefix = prefix
+        self._known_blobs = set()
+        self._lock = threading.Lock()
+
+    def put(self, local_file: str) -> Dict[str, Any]:
+        """Store `local_file` as a blob, unless it exists already.
+
+        Returns the manifest entry of the blob.
+        """
+        digest = file_hash(local_file)
+        key = f"{self.prefix}/{digest}"
+        with self._lock:
+            known = key in self._known_blobs
+        if known or self.store.exists(key):
+            logger.info(f"Blob {key} already exists, skipping upload")
+        else:
+            self.store.upload(local_file, key)
+        with self._lock:
+            self._known_blobs.add(key)
+
+        return {
+            "sha256": digest,
+            "size": os.path.getsize(local_file),
+            "url": self.store.url(key),
+        }
+
+    def put_manifest(self, blobs: Dict[str, Dict[str, Any]],
+                     key: str) -> str:
+        """Store the ``{name: blob entry}`` manifest under `key`."""
+        fd, manifest_file = tempfile.mkstemp(suffix=".json")
+        try:
+            with os.fdopen(fd, "wt") as f:
+                json.dump(blobs, f, indent=2, sort_keys=True)
+            return self.store.upload(manifest_file, key)
+        finally:
+            os.remove(manifest_file)
+
+
+class ArtifactUploader:
+    """Stores files as blobs on a bounded thread pool.
+
+    Files can be submitted while others are still being fetched. `wait`
+    returns the blob entries of all submitted files and raises the first
+    upload error, if any.
+    """
+
+    def __init__(self, blob_store: BlobStore,
+                 max_workers: int = UPLOAD_WORKERS):
+        self.blob_store = blob_store
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="artifact-upload")
+        self._futures: Dict[str, Future] = {}
+
+    def submit(self, name: str, local_file: str):
+        logger.info(f"Storing artifact `{name}`")
+        self._futures[name] = self._executor.submit(self.blob_store.put,
+                                                    local_file)
+
+    def wait(self) -> Dict[str, Dict[str, Any]]:
+        try:
+            return {
+                name: future.result()
+                for name, future in self._futures.items()
+            }
+        finally:
+            self._executor.shutdown(wait=True)
+
+    def __enter__(self) -> "ArtifactUploader":
+        return self
+
+    def __exit__(self, *exc_info):
+        self._executor.shutdown(wait=True)
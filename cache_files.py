@@ -0,0 +1,59 @@
+"""
+Helpers for files the release tools keep on local disk.
+
+Caches under `CACHE_DIR` are shared by concurrent processes, so files
+are written with `atomic_write`: the content goes to a temporary file
+next to the target, which then replaces the target in one step. Readers
+never see partially written files, and a failed write leaves no
+temporary file behind.
+"""
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+from contextlib import contextmanager
+from typing import IO, Any, Iterator
+
+CACHE_DIR = os.path.expanduser(
+    os.environ.get("RELEASER_CACHE_DIR", "~/.cache/releaser"))
+
+
+@contextmanager
+def atomic_write(path: str, mode: str = "wt") -> Iterator[IO]:
+    """Open a file that replaces `path` once the block finishes.
+
+    Missing parent dirs are created. If the block raises, `path` is left
+    untouched and the temporary file is removed.
+    """
+    target_dir = os.path.dirname(os.path.abspath(path))
+    os.makedirs(target_dir, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=target_dir)
+    try:
+        with os.fdopen(fd, mode) as f:
+            yield f
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+def write_json(path: str, data: Any):
+    with atomic_write(path) as f:
+        json.dump(data, f)
+
+
+def copy_file(source: str, path: str):
+    with open(source, "rb") as src, atomic_write(path, "wb") as f:
+        shutil.copyfileobj(src, f)
+
+
+def file_hash(path: str) -> str:
+    sha = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            sha.update(chunk)
+    return sha.hexdigest()
@@ -1,16 +1,19 @@
 import datetime
+import hashlib
+import json
 import os
+import re
 import subprocess
 import threading
 import time
-from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from contextlib import contextmanager
 from functools import partial
 from pprint import pprint
-from typing import Dict, Optional
+from types import MappingProxyType
+from typing import Dict, Mapping, Optional
 
 import jinja2
-import requests
 import toml
 import typer
 import yaml
@@ -19,6 +22,11 @@ from anyscale.credentials import load_credentials
 from anyscale.sdk.anyscale_client.sdk import AnyscaleSDK
 from dotenv import load_dotenv
 
+from cache_files import CACHE_DIR, write_json
+from git_mirror import read_blobs
+from wheel_index import find_latest_indexed_wheel
+from wheels import SEARCH_DEPTH, wheel_url
+
 load_dotenv()
 
 
@@ -27,9 +35,14 @@ PREFIX = os.environ.get("RELEASER_PREFIX", "release-automation")
 # Update the local ray dir if you want to test local changes to release tests
 LOCAL_RAY_DIR = os.environ.get("RELEASER_LOCAL_RAY_DIR", "ray")
 CLI_TOKEN = os.environ.get("ANYSCALE_CLI_TOKEN") or load_credentials()
+RAY_INIT_FILE = "python/ray/__init__.py"
+# Content hashes of cluster config files that passed validation
+VALIDATION_CACHE_DIR = os.path.join(CACHE_DIR, "validated")
 
 app = typer.Typer()
 global_context: Dict[str, str] = dict()
+# (config.toml hash + global_context) -> rendered config, see `_get_config`
+_rendered_configs: Dict[str, Mapping] = dict()
 anyscale_sdk = AnyscaleSDK(CLI_TOKEN)
 ansycale_api_client = get_api_client()
 ######
@@ -61,24 +74,34 @@ run_shell_stream = partial(run_shell, stdout=None, stderr=None)
 color_print = partial(typer.secho, fg=typer.colors.MAGENTA)
 
 
-def _get_config():
-    """Given a config file:
+def _freeze(obj):
+    """Recursively turn dicts and lists into read-only equivalents"""
+    if isinstance(obj, dict):
+        return MappingProxyType({k: _freeze(v) for k, v in obj.items()})
+    if isinstance(obj, list):
+        return tuple(_freeze(v) for v in obj)
+    return obj
+
+
+def _render_config(raw_config: dict) -> dict:
+    """Given a parsed config file:
     - replace all placeholder with global_context
     - expand test cases into test suites
     """
-    with open("config.toml") as f:
-        raw_config = toml.loads(f.read())
-
     rendered_config = {}
     for name, suite in raw_config.items():
         # Simple test suite doesn't have many cases.
         # For example microbenchmark is a simple test.
         raw_exec_command = jinja2.Template(suite["exec_cmd"])
-        rendered_config[name] = suite
+        rendered_suite = {
+            key: value
+            for key, value in suite.items()
+            if key not in ("case", "exec_cmd")
+        }
 
         is_simple_test_suite = "case" not in suite.keys()
         if is_simple_test_suite:
-            rendered_config[name]["workload_exec_cmds"] = {
+            rendered_suite["workload_exec_cmds"] = {
                 "basic": raw_exec_command.render(ctx=global_context)
             }
         else:
@@ -93,14 +116,52 @@ def _get_config():
 
                 workload_cmds[workload_name] = rendered_exec_cmd
                 workload_configs[workload_name] = ctx
-            rendered_config[name]["workload_exec_cmds"] = workload_cmds
-            rendered_config[name]["workload_configs"] = workload_configs
-            suite.pop("case")
+            rendered_suite["workload_exec_cmds"] = workload_cmds
+            rendered_suite["workload_configs"] = workload_configs
 
-        suite.pop("exec_cmd")
+        rendered_config[name] = rendered_suite
     return rendered_config
 
 
+def _get_config() -> Mapping:
+    """Return the rendered, read-only suite config from `config.toml`.
+
+    The result is computed once per (config.toml content, global_context)
+    and cached in memory and on disk.
+    """
+    with open("config.toml", "rb") as f:
+        raw = f.read()
+
+    cache_key = hashlib.sha256(
+        raw + json.dumps(global_context, sort_keys=True).encode()
+    ).hexdigest()
+    if cache_key in _rendered_configs:
+        return _rendered_configs[cache_key]
+
+    cache_file = os.path.join(CACHE_DIR, "suite_config", f"{cache_key}.json")
+    try:
+        with open(cache_file) as f:
+            rendered_config = json.load(f)
+    except (OSError, ValueError):
+        rendered_config = _render_config(toml.loads(raw.decode()))
+        try:
+            write_json(cache_file, rendered_config)
+        except (OSError, TypeError, ValueError):
+            # The config is still used, just not cached
+            pass
+
+    _rendered_configs[cache_key] = _freeze(rendered_config)
+    return _rendered_configs[cache_key]
+
+
+def _parse_ray_version(init_file_content: str) -> Optional[str]:
+    """Extract `__version__` from ray/__init__.py without executing it"""
+    match = re.search(
+        r"^__version__\s*=\s*[\"']([^\"']+)[\"']", init_file_content, re.MULTILINE
+    )
+    return match.group(1) if match else None
+
+
 def _setup_env():
     """Get workload env dict"""
     os.environ["RAY_WHEEL"] = wheel_url(
@@ -125,17 +186,6 @@ def cd(path):
     os.chdir(saved_path)
 
 
-def wheel_url(ray_version, git_branch, git_commit):
-    return f"https://s3-us-west-2.amazonaws.com/ray-wheels/" \
-           f"{git_branch}/{git_commit}/" \
-           f"ray-{ray_version}-cp37-cp37m-manylinux2014_x86_64.whl"
-
-
-def wheel_exists(ray_version, git_branch, git_commit):
-    url = wheel_url(ray_version, git_branch, git_commit)
-    return requests.head(url).status_code == 200
-
-
 ######
 
 
@@ -146,6 +196,7 @@ def ensure_repo(
     git_commit: Optional[str] = None,
     git_org: str = "ray-project",
     git_skip_checkout: bool = False,
+    wheel_search_depth: int = SEARCH_DEPTH,
 ):
     color_print("Running precondition check...")
 
@@ -166,20 +217,27 @@ def ensure_repo(
             if git_commit:
                 run_shell(f"git checkout {git_commit}")
             else:
-                # We want to find the latest commit with wheels available
-                for commit in run_shell(
-                    r'git log --oneline -20 --pretty=format:"%H"'
-                ).stdout.splitlines(keepends=False):
-                    commit = commit.strip()
-                    run_shell(f"git checkout {commit}")
-                    exec(
-                        run_shell('grep "__version__ = " python/ray/__init__.py').stdout
-                    )
-                    if wheel_exists(locals()["__version__"], git_branch, commit):
-                        break
-                else:
+                # We want to find the latest commit with wheels available.
+                # Versions are read from the object database in one batch,
+                # so only the chosen commit has to be checked out.
+                commits = run_shell(
+                    rf'git log -{wheel_search_depth} --pretty=format:"%H"'
+                ).stdout.split()
+                init_files = read_blobs(
+                    ".", [f"{commit}:{RAY_INIT_FILE}" for commit in commits]
+                )
+                candidates = []
+                for commit in commits:
+                    content = init_files[f"{commit}:{RAY_INIT_FILE}"]
+                    version = content and _parse_ray_version(content.decode())
+                    if version:
+                        candidates.append((commit, version))
+
+                found = find_latest_indexed_wheel(git_branch, candidates)
+                if not found:
                     color_print("Can't find a commit with wheels available!")
                     raise typer.Exit(1)
+                run_shell(f"git checkout {found[0]}")
 
         latest_commit = run_shell(
             r'git --no-pager log -1 --oneline --no-color --pretty=format:"%h - %an, %cr: %s"'
@@ -189,26 +247,56 @@ def ensure_repo(
         global_context["git_branch"] = git_branch
         global_context["git_commit"] = run_shell("git rev-parse HEAD").stdout.strip()
 
-        exec(run_shell('grep "__version__ = " python/ray/__init__.py').stdout)
-        global_context["ray_version"] = locals()["__version__"]
+        with open(RAY_INIT_FILE) as f:
+            global_context["ray_version"] = _parse_ray_version(f.read())
 
         color_print(f"📖 Running with context: {global_context}")
 
 
+def _validate_cluster_file(name: str, cluster_file: str, changed_only: bool):
+    assert os.path.exists(
+        cluster_file
+    ), f"Validating {name} failed: cluster config file {cluster_file} doesn't exist"
+
+    with open(cluster_file, "rb") as f:
+        content = f.read()
+
+    # A file with the same content is valid if it was valid before
+    marker = os.path.join(VALIDATION_CACHE_DIR, hashlib.sha256(content).hexdigest())
+    if changed_only and os.path.exists(marker):
+        return
+
+    yaml.safe_load(content)
+
+    try:
+        os.makedirs(VALIDATION_CACHE_DIR, exist_ok=True)
+        with open(marker, "w"):
+            pass
+    except OSError as e:
+        # The file is valid, it is just validated again next time
+        typer.secho(f"Could not record validation of {cluster_file}: {e}",
+                    fg=typer.colors.YELLOW, err=True)
+
+
 @app.command("suite:validate")
-def validate_tests():
+def validate_tests(changed_only: bool = False):
     """Validate the test suites from `config.toml`"""
     config = _get_config()
     with cd(LOCAL_RAY_DIR):
-        for name, entry in config.items():
-            cluster_file = os.path.join(entry["base_dir"], entry["cluster_config"])
-
-            assert os.path.exists(
-                cluster_file
-            ), f"Validating {name} failed: cluster config file {os.path.abspath(cluster_file)} doesn't exist"
+        cluster_files = {
+            name: os.path.abspath(
+                os.path.join(entry["base_dir"], entry["cluster_config"])
+            )
+            for name, entry in config.items()
+        }
 
-            with open(cluster_file) as f:
-                yaml.safe_load(f)
+    with ThreadPoolExecutor() as executor:
+        futures = [
+            executor.submit(_validate_cluster_file, name, cluster_file, changed_only)
+            for name, cluster_file in cluster_files.items()
+        ]
+        for future in futures:
+            future.result()
 
     color_print("😃 Validation successful! Listing all suites.")
 
@@ -250,7 +338,7 @@ def run_test(
 ):
     """Run a single test suite given `name`."""
     # Validation
-    validate_tests()
+    validate_tests(changed_only=True)
     config = _get_config()
     all_suites = list(config.keys())
     assert name in all_suites, f"{name} not found. Available suites are {all_suites}."
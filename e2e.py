@@ -4,7 +4,8 @@ release tests, running on Anyscale.
 
 The tool leverages app configs and compute templates.
 
-Calling this script will run a single release test.
+Calling this script will run a single release test. With `--suite nightly`,
+it runs all tests of a release test suite concurrently from one process.
 
 Example:
 
@@ -157,24 +158,29 @@ Release test yaml example
 
 """
 import argparse
+import asyncio
 import boto3
 import collections
+import contextlib
+import contextvars
 import copy
 import datetime
+import functools
+import gzip
 import hashlib
+import importlib.util
 import jinja2
 import json
 import logging
-import multiprocessing
 import os
-import requests
 import shutil
 import subprocess
 import sys
 import tempfile
+import threading
 import time
-from queue import Empty
-from typing import Any, Dict, Optional, Tuple, List
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional, Set, Tuple, List
 
 import yaml
 
@@ -182,8 +188,20 @@ import anyscale
 import anyscale.conf
 from anyscale.api import instantiate_api_client
 from anyscale.controllers.session_controller import SessionController
+from anyscale.sdk.anyscale_client.rest import ApiException
 from anyscale.sdk.anyscale_client.sdk import AnyscaleSDK
 
+from artifact_store import (ArtifactUploader, BlobStore,
+                            default_artifact_store)
+from cache_files import CACHE_DIR, atomic_write
+from git_mirror import get_latest_commits
+from poller import get_poller
+from session_ssh import SessionConnection, open_session_connection
+from session_sync import (SessionManifest, build_archive, changed_files,
+                          hash_tree, unpack_command)
+from wheel_index import find_latest_indexed_wheel
+from wheels import SEARCH_DEPTH
+
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 handler = logging.StreamHandler(stream=sys.stdout)
@@ -234,6 +252,40 @@ GLOBAL_CONFIG = {
 
 REPORT_S = 30
 
+# Maximum seconds between two status polls of a pending resource. Polls
+# start at one second and back off exponentially up to these ceilings.
+BUILD_POLL_MAX_S = 30
+SESSION_POLL_MAX_S = 10
+COMMAND_POLL_MAX_S = 30
+
+# Seconds after which a single Anyscale API request is given up, so calls
+# of a test that timed out don't block on an unresponsive request.
+SDK_REQUEST_TIMEOUT_S = 30
+
+# Maximum number of release tests a runner drives at once, and number of
+# threads running blocking SDK calls, file transfers and subprocesses.
+MAX_CONCURRENT_TESTS = int(os.environ.get("RELEASE_MAX_CONCURRENT_TESTS", "8"))
+RUNNER_WORKERS = int(os.environ.get("RELEASE_RUNNER_WORKERS", "32"))
+
+# Seconds a pooled session may stay idle before it is stopped, and the
+# shell command run (in addition to removing the previous test's result and
+# state files) before a session is handed to the next test. It must leave
+# the cluster as a fresh session would be, e.g. by restarting Ray. Sessions
+# are only pooled if it is set.
+SESSION_POOL_TTL_S = int(os.environ.get("RELEASE_SESSION_POOL_TTL", "600"))
+SESSION_RESET_CMD = os.environ.get("RELEASE_SESSION_RESET_CMD", "")
+
+# Remote file recording the session's working dir, written when files are
+# synced. Relative paths pulled over SSH are resolved against it.
+SESSION_WORKDIR_FILE = "/tmp/release_session_workdir"
+
+# Seconds between fetches of new command log lines while a command runs,
+# the maximum number of lines per fetch, and whether new lines are also
+# echoed to stdout.
+LOG_TAIL_INTERVAL_S = int(os.environ.get("RELEASE_LOG_TAIL_INTERVAL", "10"))
+LOG_TAIL_CHUNK_LINES = 10000
+LOG_TAIL_STDOUT = bool(int(os.environ.get("RELEASE_LOG_TAIL_STDOUT", "0")))
+
 
 def maybe_fetch_api_token():
     if GLOBAL_CONFIG["ANYSCALE_CLI_TOKEN"] is None:
@@ -285,66 +337,65 @@ def anyscale_app_config_build_url(build_id: str):
            f"/{build_id}"
 
 
-def wheel_url(ray_version, git_branch, git_commit):
-    return f"https://s3-us-west-2.amazonaws.com/ray-wheels/" \
-           f"{git_branch}/{git_commit}/" \
-           f"ray-{ray_version}-cp37-cp37m-manylinux2014_x86_64.whl"
+def find_ray_wheels(repo: str,
+                    branch: str,
+                    version: str,
+                    search_depth: int = SEARCH_DEPTH):
+    url = None
+    commits = get_latest_commits(repo, branch, count=search_depth)
+    logger.info(f"Latest 10 commits for branch {branch}: {commits[:10]} "
+                f"(searching up to {len(commits)} commits)")
+    found = find_latest_indexed_wheel(branch,
+                                      [(commit, version) for commit in commits])
+    if found:
+        _, _, url = found
+        os.environ["RAY_WHEELS"] = url
+        logger.info(f"Found wheels URL for Ray {version}, branch {branch}: "
+                    f"{url}")
+    return url
 
 
-def wheel_exists(ray_version, git_branch, git_commit):
-    url = wheel_url(ray_version, git_branch, git_commit)
-    return requests.head(url).status_code == 200
+def _check_stop(stop_event: threading.Event):
+    if stop_event.is_set():
+        raise ReleaseTestTimeoutError("Process timed out.")
 
 
-def get_latest_commits(repo: str, branch: str = "master") -> List[str]:
-    cur = os.getcwd()
-    with tempfile.TemporaryDirectory() as tmpdir:
-        os.chdir(tmpdir)
+async def wait_for_poll_async(
+        future: Future,
+        description: str,
+        stop_event: Optional[threading.Event] = None) -> Any:
+    """Wait for a future from the poller, reporting progress regularly.
 
-        clone_cmd = [
-            "git",
-            "clone",
-            "--filter=tree:0",
-            "--no-checkout",
-            # "--single-branch",
-            # "--depth=10",
-            f"--branch={branch}",
-            repo,
-            tmpdir,
-        ]
-        log_cmd = [
-            "git",
-            "log",
-            "-n",
-            "10",
-            "--pretty=format:%H",
-        ]
+    Polling stops if `stop_event` is set or the waiting task is cancelled.
+    """
+    waiter = asyncio.wrap_future(future)
+    start_wait = time.time()
+    next_report = start_wait + REPORT_S
+    try:
+        while True:
+            if stop_event is not None and stop_event.is_set():
+                future.cancel()
+                _check_stop(stop_event)
 
-        subprocess.check_output(clone_cmd)
-        commits = subprocess.check_output(log_cmd).decode(
-            sys.stdout.encoding).split("\n")
-    os.chdir(cur)
-    return commits
+            done, _ = await asyncio.wait({waiter}, timeout=1)
+            if done:
+                return waiter.result()
 
+            now = time.time()
+            if now > next_report:
+                logger.info(f"... still waiting for {description} "
+                            f"({int(now - start_wait)} seconds) ...")
+                next_report = next_report + REPORT_S
+    except asyncio.CancelledError:
+        # Stop polling if the waiting test is cancelled
+        future.cancel()
+        raise
 
-def find_ray_wheels(repo: str, branch: str, version: str):
-    url = None
-    commits = get_latest_commits(repo, branch)
-    logger.info(f"Latest 10 commits for branch {branch}: {commits}")
-    for commit in commits:
-        if wheel_exists(version, branch, commit):
-            url = wheel_url(version, branch, commit)
-            os.environ["RAY_WHEELS"] = url
-            logger.info(
-                f"Found wheels URL for Ray {version}, branch {branch}: "
-                f"{url}")
-            break
-    return url
 
-
-def _check_stop(stop_event: multiprocessing.Event):
-    if stop_event.is_set():
-        raise ReleaseTestTimeoutError("Process timed out.")
+def _done_future(result: Any) -> Future:
+    future = Future()
+    future.set_result(result)
+    return future
 
 
 def _deep_update(d, u):
@@ -363,20 +414,103 @@ def _dict_hash(dt: Dict[Any, Any]) -> str:
     return sha.hexdigest()
 
 
+class _AbsolutePathLoader(jinja2.BaseLoader):
+    """Load templates by absolute path and reload them when they change."""
+
+    def get_source(self, environment: jinja2.Environment, template: str):
+        try:
+            mtime = os.path.getmtime(template)
+            with open(template, "rt") as f:
+                source = f.read()
+        except OSError:
+            raise jinja2.TemplateNotFound(template)
+        return source, template, lambda: os.path.getmtime(template) == mtime
+
+
+_jinja_env: Optional[jinja2.Environment] = None
+
+# (path, mtime) -> env keys referenced by the template,
+# or None if the template accesses `env` dynamically
+_template_env_refs: Dict[Tuple[str, float], Optional[Tuple[str, ...]]] = {}
+
+# (path, mtime, hash of referenced env values) -> loaded config
+_rendered_configs: Dict[Tuple[str, float, str], Any] = {}
+
+
+def _get_jinja_env() -> jinja2.Environment:
+    """Shared environment, compiled templates are cached on disk if we can."""
+    global _jinja_env
+    if _jinja_env is None:
+        bytecode_dir = os.path.join(CACHE_DIR, "jinja2")
+        bytecode_cache = None
+        try:
+            os.makedirs(bytecode_dir, exist_ok=True)
+            bytecode_cache = jinja2.FileSystemBytecodeCache(bytecode_dir)
+        except OSError as e:
+            logger.warning(f"Could not create template cache dir "
+                           f"{bytecode_dir}, not caching templates: {e}")
+        _jinja_env = jinja2.Environment(
+            loader=_AbsolutePathLoader(), bytecode_cache=bytecode_cache)
+    return _jinja_env
+
+
+def _find_env_refs(config_path: str) -> Optional[Tuple[str, ...]]:
+    """Return the constant keys a template looks up in `env`.
+
+    Returns None if `env` is used in any other way (e.g. ``env.get(key)``
+    or passed to a filter), since then any key might be read.
+    """
+    jinja_env = _get_jinja_env()
+    source, _, _ = jinja_env.loader.get_source(jinja_env, config_path)
+    ast = jinja_env.parse(source)
+
+    keys = set()
+    num_lookups = 0
+    for node in ast.find_all((jinja2.nodes.Getitem, jinja2.nodes.Getattr)):
+        if not (isinstance(node.node, jinja2.nodes.Name)
+                and node.node.name == "env"):
+            continue
+        num_lookups += 1
+        if isinstance(node, jinja2.nodes.Getattr) and not hasattr(
+                dict, node.attr):
+            keys.add(node.attr)
+        elif isinstance(node, jinja2.nodes.Getitem) and isinstance(
+                node.arg, jinja2.nodes.Const):
+            keys.add(node.arg.value)
+        else:
+            return None
+
+    num_env_names = sum(1 for node in ast.find_all(jinja2.nodes.Name)
+                        if node.name == "env")
+    if num_env_names != num_lookups:
+        return None
+    return tuple(sorted(keys))
+
+
 def _load_config(local_dir: str, config_file: Optional[str]) -> Optional[Dict]:
     if not config_file:
         return None
 
-    config_path = os.path.join(local_dir, config_file)
-    with open(config_path, "rt") as f:
-        # Todo: jinja2 render
-        content = f.read()
+    config_path = os.path.abspath(os.path.join(local_dir, config_file))
 
-    env = copy.deepcopy(os.environ)
+    env = dict(os.environ)
     env.update(GLOBAL_CONFIG)
 
-    content = jinja2.Template(content).render(env=env)
-    return yaml.safe_load(content)
+    # Only re-render if the file or the env values it references changed.
+    mtime = os.path.getmtime(config_path)
+    if (config_path, mtime) not in _template_env_refs:
+        _template_env_refs[(config_path, mtime)] = _find_env_refs(config_path)
+    refs = _template_env_refs[(config_path, mtime)]
+    if refs is None:
+        refs = sorted(env)
+    cache_key = (config_path, mtime, _dict_hash({k: env.get(k)
+                                                 for k in refs}))
+
+    if cache_key not in _rendered_configs:
+        template = _get_jinja_env().get_template(config_path)
+        content = template.render(env=env)
+        _rendered_configs[cache_key] = yaml.safe_load(content)
+    return copy.deepcopy(_rendered_configs[cache_key])
 
 
 def has_errored(result: Dict[Any, Any]) -> bool:
@@ -462,7 +596,10 @@ def report_result(test_suite: str, test_name: str, status: str, logs: str,
 def _cleanup_session(sdk: AnyscaleSDK, session_id: str):
     if session_id:
         # Just trigger a request. No need to wait until session shutdown.
-        sdk.stop_session(session_id=session_id, stop_session_options={})
+        sdk.stop_session(
+            session_id=session_id,
+            stop_session_options={},
+            _request_timeout=SDK_REQUEST_TIMEOUT_S)
 
 
 def search_running_session(sdk: AnyscaleSDK, project_id: str,
@@ -473,7 +610,8 @@ def search_running_session(sdk: AnyscaleSDK, project_id: str,
 
     result = sdk.search_sessions(
         project_id=project_id,
-        sessions_query=dict(name=dict(equals=session_name)))
+        sessions_query=dict(name=dict(equals=session_name)),
+        _request_timeout=SDK_REQUEST_TIMEOUT_S)
 
     if len(result.results) > 0 and result.results[0].state == "Running":
         logger.info("Found existing session.")
@@ -481,6 +619,208 @@ def search_running_session(sdk: AnyscaleSDK, project_id: str,
     return session_id
 
 
+class ResourceRegistry:
+    """Persistent map of resource name -> Anyscale resource ID.
+
+    Compute template and app config names contain the hash of their
+    config, so a registered name can be resolved to its ID without paging
+    through the SDK search endpoints. Entries are stored as one file each
+    under the releaser cache dir.
+    """
+
+    def __init__(self, kind: str, cache_dir: str = CACHE_DIR):
+        self.kind = kind
+        self.registry_dir = os.path.join(cache_dir, "resources", kind)
+
+    def _path(self, name: str) -> str:
+        key = json.dumps([GLOBAL_CONFIG["ANYSCALE_HOST"], name])
+        return os.path.join(self.registry_dir,
+                            hashlib.sha256(key.encode()).hexdigest())
+
+    def get(self, name: str) -> Optional[str]:
+        try:
+            with open(self._path(name), "rt") as f:
+                return f.read().strip() or None
+        except OSError:
+            return None
+
+    def put(self, name: str, resource_id: str):
+        try:
+            with atomic_write(self._path(name)) as f:
+                f.write(resource_id)
+        except OSError as e:
+            logger.warning(f"Could not register {self.kind} {name}: {e}")
+
+    def invalidate(self, name: str):
+        try:
+            os.remove(self._path(name))
+        except OSError:
+            pass
+
+    def find(self, name: str,
+             get_resource: Callable[[str], Any]) -> Optional[str]:
+        """Return the registered ID for `name` if it still exists.
+
+        `get_resource` is called with the registered ID to validate it.
+        If it 404s, the entry is invalidated and None is returned.
+        """
+        resource_id = self.get(name)
+        if not resource_id:
+            return None
+
+        try:
+            get_resource(resource_id)
+        except ApiException as e:
+            if e.status != 404:
+                raise
+            logger.info(f"Registered {self.kind} {resource_id} for {name} "
+                        f"doesn't exist anymore.")
+            self.invalidate(name)
+            return None
+        return resource_id
+
+
+compute_template_registry = ResourceRegistry("compute_template")
+app_config_registry = ResourceRegistry("app_config")
+
+
+class ResourceIndex:
+    """Process-wide name -> ID index of a project's resources.
+
+    Processes running many tests (see `run_suite`) call `prefetch` to page
+    through all resources of the project once. Their later lookups are
+    answered from memory, and resources created by the process are added
+    as they are created. Without a prefetch, each lookup is a single
+    query for the name.
+    """
+
+    def __init__(self, kind: str,
+                 list_page: Callable[[AnyscaleSDK, str, Optional[str]], Any],
+                 find_one: Callable[[AnyscaleSDK, str, str], Optional[str]]):
+        self.kind = kind
+        self._list_page = list_page
+        self._find_one = find_one
+        self._names: Dict[str, Dict[str, str]] = {}
+        self._lock = threading.Lock()
+
+    def is_loaded(self, project_id: str) -> bool:
+        return project_id in self._names
+
+    def prefetch(self, sdk: AnyscaleSDK, project_id: str):
+        with self._lock:
+            if project_id not in self._names:
+                self._prefetch(sdk, project_id)
+
+    def _prefetch(self, sdk: AnyscaleSDK, project_id: str):
+        logger.info(f"Prefetching all {self.kind}s of project {project_id}")
+        names = {}
+        paging_token = None
+        num_pages = 0
+        while True:
+            result = self._list_page(sdk, project_id, paging_token)
+            num_pages += 1
+            for res in result.results:
+                names.setdefault(res.name, res.id)
+            paging_token = result.metadata.next_paging_token
+            if not paging_token:
+                break
+        logger.info(f"Indexed {len(names)} {self.kind}s "
+                    f"from {num_pages} pages")
+        self._names[project_id] = names
+
+    def find(self, sdk: AnyscaleSDK, project_id: str,
+             name: str) -> Optional[str]:
+        with self._lock:
+            names = self._names.get(project_id)
+        if names is not None:
+            return names.get(name)
+        return self._find_one(sdk, project_id, name)
+
+    def add(self, project_id: str, name: str, resource_id: str):
+        with self._lock:
+            if project_id in self._names:
+                self._names[project_id][name] = resource_id
+
+    def invalidate(self, project_id: str):
+        with self._lock:
+            self._names.pop(project_id, None)
+
+
+def _list_compute_templates_page(sdk: AnyscaleSDK, project_id: str,
+                                 paging_token: Optional[str]):
+    return sdk.search_compute_templates(
+        dict(project_id=project_id, include_anonymous=True),
+        paging_token=paging_token,
+        _request_timeout=SDK_REQUEST_TIMEOUT_S)
+
+
+def _find_compute_template(sdk: AnyscaleSDK, project_id: str,
+                           name: str) -> Optional[str]:
+    result = sdk.search_compute_templates(
+        dict(
+            project_id=project_id,
+            name=dict(equals=name),
+            include_anonymous=True),
+        _request_timeout=SDK_REQUEST_TIMEOUT_S)
+    for res in result.results:
+        if res.name == name:
+            return res.id
+    return None
+
+
+def _list_app_configs_page(sdk: AnyscaleSDK, project_id: str,
+                           paging_token: Optional[str]):
+    return sdk.list_app_configs(
+        project_id=project_id,
+        count=50,
+        paging_token=paging_token,
+        _request_timeout=SDK_REQUEST_TIMEOUT_S)
+
+
+def _find_app_config(sdk: AnyscaleSDK, project_id: str,
+                     name: str) -> Optional[str]:
+    # App configs can't be searched by name, so page until we find it
+    paging_token = None
+    while True:
+        result = _list_app_configs_page(sdk, project_id, paging_token)
+        for res in result.results:
+            if res.name == name:
+                return res.id
+        paging_token = result.metadata.next_paging_token
+        if not paging_token:
+            return None
+
+
+compute_template_index = ResourceIndex(
+    "compute template", _list_compute_templates_page, _find_compute_template)
+app_config_index = ResourceIndex("app config", _list_app_configs_page,
+                                 _find_app_config)
+
+
+def _find_resource_id(sdk: AnyscaleSDK, project_id: str, name: str,
+                      registry: ResourceRegistry, index: ResourceIndex,
+                      get_resource: Callable[[str], Any]) -> Optional[str]:
+    """Look up a resource ID by name.
+
+    If this process already indexed the project, answer from memory.
+    Otherwise try the persistent registry (one API call) before querying
+    the resource by name.
+    """
+    if not index.is_loaded(project_id):
+        resource_id = registry.find(name, get_resource)
+        if resource_id:
+            logger.info(f"Found registered {index.kind} {name} "
+                        f"with ID {resource_id}")
+            return resource_id
+
+    resource_id = index.find(sdk, project_id, name)
+    if resource_id:
+        logger.info(f"{index.kind.capitalize()} {name} already exists "
+                    f"with ID {resource_id}")
+        registry.put(name, resource_id)
+    return resource_id
+
+
 def create_or_find_compute_template(
         sdk: AnyscaleSDK,
         project_id: str,
@@ -497,25 +837,9 @@ def create_or_find_compute_template(
                     f"with name {compute_tpl_name}. Looking up existing "
                     f"templates.")
 
-        paging_token = None
-        while not compute_tpl_id:
-            result = sdk.search_compute_templates(
-                dict(
-                    project_id=project_id,
-                    name=dict(equals=compute_tpl_name),
-                    include_anonymous=True),
-                paging_token=paging_token)
-            paging_token = result.metadata.next_paging_token
-
-            for res in result.results:
-                if res.name == compute_tpl_name:
-                    compute_tpl_id = res.id
-                    logger.info(
-                        f"Template already exists with ID {compute_tpl_id}")
-                    break
-
-            if not paging_token:
-                break
+        compute_tpl_id = _find_resource_id(
+            sdk, project_id, compute_tpl_name, compute_template_registry,
+            compute_template_index, sdk.get_compute_template)
 
         if not compute_tpl_id:
             logger.info(f"Compute template not found. "
@@ -525,7 +849,8 @@ def create_or_find_compute_template(
                     dict(
                         name=compute_tpl_name,
                         project_id=project_id,
-                        config=compute_tpl))
+                        config=compute_tpl),
+                    _request_timeout=SDK_REQUEST_TIMEOUT_S)
                 compute_tpl_id = result.result.id
             except Exception as e:
                 if _repeat:
@@ -533,6 +858,8 @@ def create_or_find_compute_template(
                         f"Got exception when trying to create compute "
                         f"template: {e}. Sleeping for 10 seconds and then "
                         f"try again once...")
+                    # It might have been created by someone else meanwhile
+                    compute_template_index.invalidate(project_id)
                     time.sleep(10)
                     return create_or_find_compute_template(
                         sdk=sdk,
@@ -543,6 +870,9 @@ def create_or_find_compute_template(
                 raise e
 
             logger.info(f"Compute template created with ID {compute_tpl_id}")
+            compute_template_index.add(project_id, compute_tpl_name,
+                                       compute_tpl_id)
+            compute_template_registry.put(compute_tpl_name, compute_tpl_id)
 
     return compute_tpl_id, compute_tpl_name
 
@@ -560,21 +890,10 @@ def create_or_find_app_config(
         logger.info(f"Test uses an app config with hash {app_config_name}. "
                     f"Looking up existing app configs with this name.")
 
-        paging_token = None
-        while not app_config_id:
-            result = sdk.list_app_configs(
-                project_id=project_id, count=50, paging_token=paging_token)
-            paging_token = result.metadata.next_paging_token
-
-            for res in result.results:
-                if res.name == app_config_name:
-                    app_config_id = res.id
-                    logger.info(
-                        f"App config already exists with ID {app_config_id}")
-                    break
-
-            if not paging_token or app_config_id:
-                break
+        app_config_id = _find_resource_id(sdk, project_id, app_config_name,
+                                          app_config_registry,
+                                          app_config_index,
+                                          sdk.get_app_config)
 
         if not app_config_id:
             logger.info("App config not found. Creating new one.")
@@ -583,7 +902,8 @@ def create_or_find_app_config(
                     dict(
                         name=app_config_name,
                         project_id=project_id,
-                        config_json=app_config))
+                        config_json=app_config),
+                    _request_timeout=SDK_REQUEST_TIMEOUT_S)
                 app_config_id = result.result.id
             except Exception as e:
                 if _repeat:
@@ -591,6 +911,8 @@ def create_or_find_app_config(
                         f"Got exception when trying to create app "
                         f"config: {e}. Sleeping for 10 seconds and then "
                         f"try again once...")
+                    # It might have been created by someone else meanwhile
+                    app_config_index.invalidate(project_id)
                     time.sleep(10)
                     return create_or_find_app_config(
                         sdk=sdk,
@@ -601,15 +923,21 @@ def create_or_find_app_config(
                 raise e
 
             logger.info(f"App config created with ID {app_config_id}")
+            app_config_index.add(project_id, app_config_name, app_config_id)
+            app_config_registry.put(app_config_name, app_config_id)
 
     return app_config_id, app_config_name
 
 
 def install_app_config_packages(app_config: Dict[Any, Any]):
-    os.environ.update(app_config.get("env_vars", {}))
+    # Tests share this process, so the app config's env vars are only
+    # passed to pip here (and to the test script by `run_job`)
+    env = dict(os.environ, **app_config.get("env_vars", {}))
     packages = app_config["python"]["pip_packages"]
     for package in packages:
-        subprocess.check_output(["pip", "install", "-U", package], text=True)
+        subprocess.check_output(["pip", "install", "-U", package],
+                                env=env,
+                                text=True)
 
 
 def install_matching_ray():
@@ -628,15 +956,18 @@ def install_matching_ray():
     subprocess.check_output(["pip", "install", "-U", wheel], text=True)
 
 
-def wait_for_build_or_raise(sdk: AnyscaleSDK,
-                            app_config_id: Optional[str]) -> Optional[str]:
-    if not app_config_id:
-        return None
+def find_build(sdk: AnyscaleSDK,
+               app_config_id: str) -> Tuple[str, Future]:
+    """Find the latest build of an app config.
 
+    Returns the build ID and a future that resolves to it once the build
+    succeeded. Failed builds raise.
+    """
     # Fetch build
     build_id = None
     last_status = None
-    result = sdk.list_builds(app_config_id)
+    result = sdk.list_builds(
+        app_config_id, _request_timeout=SDK_REQUEST_TIMEOUT_S)
     for build in sorted(result.results, key=lambda b: b.created_at):
         build_id = build.id
         last_status = build.status
@@ -647,7 +978,7 @@ def wait_for_build_or_raise(sdk: AnyscaleSDK,
         if build.status == "succeeded":
             logger.info(f"Link to app config build: "
                         f"{anyscale_app_config_build_url(build_id)}")
-            return build_id
+            return build_id, _done_future(build_id)
 
     if last_status == "failed":
         raise RuntimeError("App config build failed.")
@@ -656,20 +987,13 @@ def wait_for_build_or_raise(sdk: AnyscaleSDK,
         raise RuntimeError("No build found for app config.")
 
     # Build found but not failed/finished yet
-    completed = False
-    start_wait = time.time()
-    next_report = start_wait + REPORT_S
     logger.info(f"Waiting for build {build_id} to finish...")
     logger.info(f"Track progress here: "
                 f"{anyscale_app_config_build_url(build_id)}")
-    while not completed:
-        now = time.time()
-        if now > next_report:
-            logger.info(f"... still waiting for build {build_id} to finish "
-                        f"({int(now - start_wait)} seconds) ...")
-            next_report = next_report + REPORT_S
-
-        result = sdk.get_build(build_id)
+
+    def _poll_build():
+        result = sdk.get_build(
+            build_id, _request_timeout=SDK_REQUEST_TIMEOUT_S)
         build = result.result
 
         if build.status == "failed":
@@ -679,24 +1003,34 @@ def wait_for_build_or_raise(sdk: AnyscaleSDK,
 
         if build.status == "succeeded":
             logger.info("Build succeeded.")
-            return build_id
-
-        completed = build.status not in ["in_progress", "pending"]
+            return True, build_id
 
-        if completed:
+        if build.status not in ["in_progress", "pending"]:
             raise RuntimeError(
                 f"Unknown build status: {build.status}. Please see "
                 f"{anyscale_app_config_build_url(build_id)} for details")
 
-        time.sleep(1)
+        return False, None
 
-    return build_id
+    future = get_poller().submit(_poll_build, max_interval=BUILD_POLL_MAX_S)
+    return build_id, future
 
 
 def run_job(cluster_name: str, compute_tpl_name: str, cluster_env_name: str,
             job_name: str, min_workers: str, script: str,
             script_args: List[str],
-            env_vars: Dict[str, str]) -> Tuple[int, str]:
+            env_vars: Dict[str, str],
+            cwd: Optional[str] = None,
+            log_file: Optional[str] = None,
+            log_lines: int = 50,
+            stop_event: Optional[threading.Event] = None) -> Tuple[int, str]:
+    """Run a release test script in client mode.
+
+    The full output of the script is streamed to `log_file`, if passed.
+    Only the last `log_lines` lines are kept in memory and returned
+    together with the return code. Once `stop_event` is set, the script
+    is terminated and `ReleaseTestTimeoutError` is raised.
+    """
     # Start cluster and job
     address = f"anyscale://{cluster_name}?cluster_compute={compute_tpl_name}" \
               f"&cluster_env={cluster_env_name}&autosuspend=5&&update=True"
@@ -710,27 +1044,51 @@ def run_job(cluster_name: str, compute_tpl_name: str, cluster_env_name: str,
     proc = subprocess.Popen(
         script.split(" ") + script_args,
         env=env,
+        cwd=cwd,
         stdout=subprocess.PIPE,
         stderr=subprocess.STDOUT,
         text=True)
     proc.stdout.reconfigure(line_buffering=True)
-    logs = ""
-    for line in proc.stdout:
-        logs += line
-        sys.stdout.write(line)
+
+    def _terminate_on_stop():
+        while proc.poll() is None:
+            if stop_event.wait(timeout=1):
+                logger.warning(f"Terminating job {job_name}")
+                proc.terminate()
+                try:
+                    proc.wait(timeout=10)
+                except subprocess.TimeoutExpired:
+                    proc.kill()
+                return
+
+    if stop_event is not None:
+        threading.Thread(target=_terminate_on_stop, daemon=True).start()
+
+    last_lines = collections.deque(maxlen=log_lines)
+    with contextlib.ExitStack() as stack:
+        f = stack.enter_context(open(log_file, "at")) if log_file else None
+        for line in proc.stdout:
+            last_lines.append(line)
+            if f:
+                f.write(line)
+            sys.stdout.write(line)
     proc.wait()
-    return proc.returncode, logs
+    if stop_event is not None:
+        _check_stop(stop_event)
+    return proc.returncode, "".join(last_lines)
 
 
-def create_and_wait_for_session(
-        sdk: AnyscaleSDK,
-        stop_event: multiprocessing.Event,
-        session_name: str,
-        session_options: Dict[Any, Any],
-) -> str:
+def start_session(sdk: AnyscaleSDK, session_name: str,
+                  session_options: Dict[Any, Any]) -> Tuple[str, Future]:
+    """Create and start a session.
+
+    Returns the session ID and a future that resolves once the session
+    is up.
+    """
     # Create session
     logger.info(f"Creating session {session_name}")
-    result = sdk.create_session(session_options)
+    result = sdk.create_session(
+        session_options, _request_timeout=SDK_REQUEST_TIMEOUT_S)
     session_id = result.result.id
 
     # Trigger session start
@@ -739,39 +1097,41 @@ def create_and_wait_for_session(
         project_id=GLOBAL_CONFIG["ANYSCALE_PROJECT"], session_id=session_id)
     logger.info(f"Link to session: {session_url}")
 
-    result = sdk.start_session(session_id, start_session_options={})
+    result = sdk.start_session(
+        session_id,
+        start_session_options={},
+        _request_timeout=SDK_REQUEST_TIMEOUT_S)
     sop_id = result.result.id
     completed = result.result.completed
 
     # Wait for session
     logger.info(f"Waiting for session {session_name}...")
-    start_wait = time.time()
-    next_report = start_wait + REPORT_S
-    while not completed:
-        _check_stop(stop_event)
-        now = time.time()
-        if now > next_report:
-            logger.info(f"... still waiting for session {session_name} "
-                        f"({int(now - start_wait)} seconds) ...")
-            next_report = next_report + REPORT_S
+    if completed:
+        return session_id, _done_future(None)
 
+    def _poll_session_operation():
         session_operation_response = sdk.get_session_operation(
-            sop_id, _request_timeout=30)
+            sop_id, _request_timeout=SDK_REQUEST_TIMEOUT_S)
         session_operation = session_operation_response.result
-        completed = session_operation.completed
-        time.sleep(1)
+        return session_operation.completed, None
 
-    return session_id
+    future = get_poller().submit(
+        _poll_session_operation, max_interval=SESSION_POLL_MAX_S)
+    return session_id, future
 
 
-def run_session_command(sdk: AnyscaleSDK,
-                        session_id: str,
-                        cmd_to_run: str,
-                        stop_event: multiprocessing.Event,
-                        result_queue: multiprocessing.Queue,
-                        env_vars: Dict[str, str],
-                        state_str: str = "CMD_RUN",
-                        kick_off_only: bool = False) -> Tuple[str, int]:
+def start_session_command(sdk: AnyscaleSDK,
+                          session_id: str,
+                          cmd_to_run: str,
+                          env_vars: Dict[str, str],
+                          kick_off_only: bool = False
+                          ) -> Tuple[str, Optional[Future]]:
+    """Run a command in a session.
+
+    Returns the session command ID and a future that resolves to the
+    finished session command. If `kick_off_only` is set, the command is
+    not tracked and no future is returned.
+    """
     full_cmd = " ".join(f"{k}={v}"
                         for k, v in env_vars.items()) + " " + cmd_to_run
 
@@ -779,63 +1139,238 @@ def run_session_command(sdk: AnyscaleSDK,
     session_url = anyscale_session_url(
         project_id=GLOBAL_CONFIG["ANYSCALE_PROJECT"], session_id=session_id)
     logger.info(f"Link to session: {session_url}")
-    result_queue.put(State(state_str, time.time(), None))
     result = sdk.create_session_command(
-        dict(session_id=session_id, shell_command=full_cmd))
+        dict(session_id=session_id, shell_command=full_cmd),
+        _request_timeout=SDK_REQUEST_TIMEOUT_S)
 
     scd_id = result.result.id
     completed = result.result.finished_at is not None
 
     if kick_off_only:
-        return scd_id, 0
+        return scd_id, None
 
-    start_wait = time.time()
-    next_report = start_wait + REPORT_S
-    while not completed:
-        _check_stop(stop_event)
+    if completed:
+        return scd_id, _done_future(result)
 
-        now = time.time()
-        if now > next_report:
-            logger.info(f"... still waiting for command to finish "
-                        f"({int(now - start_wait)} seconds) ...")
-            next_report = next_report + REPORT_S
+    def _poll_session_command():
+        result = sdk.get_session_command(
+            session_command_id=scd_id, _request_timeout=SDK_REQUEST_TIMEOUT_S)
+        return result.result.finished_at is not None, result
 
-        result = sdk.get_session_command(session_command_id=scd_id)
-        completed = result.result.finished_at
-        time.sleep(1)
+    future = get_poller().submit(
+        _poll_session_command, max_interval=COMMAND_POLL_MAX_S)
+    return scd_id, future
 
+
+def _command_status_or_raise(result) -> int:
     status_code = result.result.status_code
 
     if status_code != 0:
         raise RuntimeError(
             f"Command returned non-success status: {status_code}")
 
-    return scd_id, status_code
+    return status_code
 
 
 def get_command_logs(session_controller: SessionController,
                      scd_id: str,
                      lines: int = 50):
     result = session_controller.api_client.get_execution_logs_api_v2_session_commands_session_command_id_execution_logs_get(
-        session_command_id=scd_id, start_line=-1 * lines, end_line=0)
+        session_command_id=scd_id,
+        start_line=-1 * lines,
+        end_line=0,
+        _request_timeout=SDK_REQUEST_TIMEOUT_S)
 
     return result.result.lines
 
 
+class CommandLogTail:
+    """Streams the logs of a session command into a local spool file.
+
+    Each `poll` fetches only the lines after the ones already spooled, so
+    the full log of a long running command is collected in small pieces
+    while it runs instead of in one large fetch at the end.
+    """
+
+    def __init__(self,
+                 session_controller: SessionController,
+                 scd_id: str,
+                 spool_file: str,
+                 echo: bool = LOG_TAIL_STDOUT,
+                 chunk_lines: int = LOG_TAIL_CHUNK_LINES):
+        self.session_controller = session_controller
+        self.scd_id = scd_id
+        self.spool_file = spool_file
+        self.echo = echo
+        self.chunk_lines = chunk_lines
+        self.offset = 0
+
+    def poll(self) -> int:
+        """Append new log lines to the spool file and return their number."""
+        api_client = self.session_controller.api_client
+        num_lines = 0
+        while True:
+            result = api_client.get_execution_logs_api_v2_session_commands_session_command_id_execution_logs_get(
+                session_command_id=self.scd_id,
+                start_line=self.offset,
+                end_line=self.offset + self.chunk_lines,
+                _request_timeout=SDK_REQUEST_TIMEOUT_S)
+            # Only split on newlines, like the server counts lines. Carriage
+            # returns of progress bars stay within their line. A trailing
+            # partial line is fetched again once its newline arrived.
+            lines = [
+                f"{line}\n"
+                for line in result.result.lines.split("\n")[:-1]
+            ]
+            if not lines:
+                return num_lines
+
+            with open(self.spool_file, "at") as f:
+                f.writelines(lines)
+            if self.echo:
+                sys.stdout.writelines(lines)
+                sys.stdout.flush()
+
+            self.offset += len(lines)
+            num_lines += len(lines)
+            if len(lines) < self.chunk_lines:
+                return num_lines
+
+
+class SessionFiles:
+    """File transfers to and from one session.
+
+    All transfers go through a single multiplexed SSH connection to the
+    head node, opened on first use and kept until `close`. If the
+    connection can't be opened, or a relative path can't be resolved
+    because the session's working dir is unknown, the transfer falls back
+    to the session controller.
+    """
+
+    def __init__(self, session_controller: SessionController,
+                 session_id: str, session_name: str, local_dir: str):
+        self.session_controller = session_controller
+        self.session_id = session_id
+        self.session_name = session_name
+        self.local_dir = local_dir
+        self._lock = threading.Lock()
+        self._connection: Optional[SessionConnection] = None
+        self._connection_failed = False
+        self._workdir: Optional[str] = None
+
+    def _connect(self) -> Optional[SessionConnection]:
+        with self._lock:
+            if self._connection is None and not self._connection_failed:
+                try:
+                    self._connection = open_session_connection(
+                        self.session_controller.api_client, self.session_id)
+                except Exception as e:
+                    logger.warning(
+                        f"Could not open SSH connection to session "
+                        f"{self.session_name}, using the session controller "
+                        f"for file transfers: {e}")
+                    self._connection_failed = True
+            return self._connection
+
+    def _remote_path(self, connection: SessionConnection,
+                     path: str) -> Optional[str]:
+        if os.path.isabs(path):
+            return path
+        with self._lock:
+            if self._workdir is None:
+                try:
+                    self._workdir = connection.run(
+                        f"cat {SESSION_WORKDIR_FILE}").decode().strip()
+                except subprocess.CalledProcessError:
+                    return None
+        return os.path.join(self._workdir, path)
+
+    def push(self, source: str, target: str):
+        connection = self._connect()
+        remote_target = connection and self._remote_path(connection, target)
+        if remote_target:
+            connection.push(source, remote_target)
+            return
+
+        with _in_project_dir(self.local_dir):
+            self.session_controller.push(
+                session_name=self.session_name,
+                source=source,
+                target=target,
+                config=None,
+                all_nodes=False,
+            )
+
+    def pull(self, source: str, target: str):
+        connection = self._connect()
+        remote_source = connection and self._remote_path(connection, source)
+        if remote_source:
+            connection.pull(remote_source, target)
+            return
+
+        with _in_project_dir(self.local_dir):
+            self.session_controller.pull(
+                session_name=self.session_name, source=source, target=target)
+
+    def pull_many(self,
+                  sources: Dict[str, str],
+                  target_dir: str,
+                  on_file: Optional[Callable[[str, str], None]] = None
+                  ) -> Dict[str, str]:
+        """Pull several files or dirs, in one archive transfer if possible.
+
+        `sources` maps names to remote paths. Returns a map of name ->
+        local path (``target_dir/<name>``) of the sources that exist.
+        `on_file` is called with the name and local path of each file as
+        soon as it is pulled. Files within a dir are passed as
+        ``<name>/<relative path>``.
+        """
+        connection = self._connect()
+        remote_sources = {}
+        if connection:
+            for name, source in sources.items():
+                remote_source = self._remote_path(connection, source)
+                if not remote_source:
+                    break
+                remote_sources[name] = remote_source
+            else:
+                return connection.pull_many(remote_sources, target_dir,
+                                            on_file)
+
+        pulled = {}
+        for name, source in sources.items():
+            local_path = os.path.join(target_dir, name)
+            self.pull(source, local_path)
+            pulled[name] = local_path
+            if not on_file:
+                continue
+            if not os.path.isdir(local_path):
+                on_file(name, local_path)
+                continue
+            for root, _, files in os.walk(local_path):
+                for file in sorted(files):
+                    path = os.path.join(root, file)
+                    rel_path = os.path.relpath(path, local_path)
+                    on_file(f"{name}/{rel_path}", path)
+        return pulled
+
+    def close(self):
+        with self._lock:
+            connection, self._connection = self._connection, None
+        if connection:
+            connection.close()
+
+
 def get_remote_json_content(
         temp_dir: str,
-        session_name: str,
         remote_file: Optional[str],
-        session_controller: SessionController,
+        session_files: SessionFiles,
 ):
     if not remote_file:
         logger.warning("No remote file specified, returning empty dict")
         return {}
     local_target_file = os.path.join(temp_dir, ".tmp.json")
-    session_controller.pull(
-        session_name=session_name,
-        source=remote_file,
-        target=local_target_file)
+    session_files.pull(source=remote_file, target=local_target_file)
     with open(local_target_file, "rt") as f:
         return json.load(f)
 
@@ -848,48 +1383,85 @@ def get_local_json_content(local_file: Optional[str], ):
         return json.load(f)
 
 
+_blob_store: Optional[BlobStore] = None
+_blob_store_lock = threading.Lock()
+
+
+def get_blob_store() -> BlobStore:
+    """Return the artifact blob store shared by all tests of this process.
+
+    Blobs are stored under ``<RELEASE_AWS_LOCATION>/blobs``.
+    """
+    global _blob_store
+    with _blob_store_lock:
+        if _blob_store is None:
+            _blob_store = BlobStore(
+                default_artifact_store(GLOBAL_CONFIG["RELEASE_AWS_BUCKET"]),
+                f"{GLOBAL_CONFIG['RELEASE_AWS_LOCATION']}/blobs")
+        return _blob_store
+
+
+def compress_log(log_file: str) -> str:
+    """Gzip `log_file` next to it and return the compressed file.
+
+    The log is streamed, so it is never read into memory at once. The
+    gzip header holds no file name or time, so identical logs compress to
+    identical blobs.
+    """
+    compressed_log_file = f"{log_file}.gz"
+    with open(log_file, "rb") as f_in, \
+            open(compressed_log_file, "wb") as f_out, \
+            gzip.GzipFile(filename="", mode="wb", compresslevel=6,
+                          fileobj=f_out, mtime=0) as f_gz:
+        shutil.copyfileobj(f_in, f_gz, 1 << 20)
+    return compressed_log_file
+
+
 def pull_artifacts_and_store_in_cloud(
         temp_dir: str,
         logs: str,
         session_name: str,
         test_name: str,
         artifacts: Optional[Dict[Any, Any]],
-        session_controller: SessionController,
+        session_files: Optional[SessionFiles],
+        log_spool: Optional[str] = None,
 ):
     output_log_file = os.path.join(temp_dir, "output.log")
     with open(output_log_file, "wt") as f:
         f.write(logs)
 
-    bucket = GLOBAL_CONFIG["RELEASE_AWS_BUCKET"]
     location = f"{GLOBAL_CONFIG['RELEASE_AWS_LOCATION']}" f"/{session_name}/{test_name}"
-    saved_artifacts = {}
-
-    s3_client = boto3.client("s3")
-    s3_client.upload_file(output_log_file, bucket, f"{location}/output.log")
-    saved_artifacts["output.log"] = f"s3://{bucket}/{location}/output.log"
-
-    # Download artifacts
-    if artifacts:
-        for name, remote_file in artifacts.items():
-            logger.info(f"Downloading artifact `{name}` from "
-                        f"{remote_file}")
-            local_target_file = os.path.join(temp_dir, name)
-            session_controller.pull(
-                session_name=session_name,
-                source=remote_file,
-                target=local_target_file)
-
-            # Upload artifacts to s3
-            s3_client.upload_file(local_target_file, bucket,
-                                  f"{location}/{name}")
-            saved_artifacts[name] = f"s3://{bucket}/{location}/{name}"
-
+    blob_store = get_blob_store()
+
+    # Files are stored concurrently, each as soon as it is available
+    with ArtifactUploader(blob_store) as uploader:
+        uploader.submit("output.log", output_log_file)
+
+        # Download all artifacts in one transfer
+        if artifacts:
+            logger.info(f"Downloading artifacts {list(artifacts)}")
+            local_files = session_files.pull_many(
+                artifacts, temp_dir, on_file=uploader.submit)
+            missing = [name for name in artifacts if name not in local_files]
+            if missing:
+                raise RuntimeError(f"Could not download artifacts {missing}")
+
+        # Archive the full command logs collected while the test ran
+        if log_spool and os.path.exists(log_spool):
+            uploader.submit("command.log.gz", compress_log(log_spool))
+
+        blobs = uploader.wait()
+
+    # The test's location only holds the manifest pointing at the blobs
+    saved_artifacts = {name: blob["url"] for name, blob in blobs.items()}
+    saved_artifacts["manifest.json"] = blob_store.put_manifest(
+        blobs, f"{location}/manifest.json")
     return saved_artifacts
 
 
 def find_session_by_test_name(
         sdk: AnyscaleSDK,
-        session_controller: SessionController,
+        get_session_files: Callable[[str, str], SessionFiles],
         temp_dir: str,
         state_json: str,
         project_id: str,
@@ -903,7 +1475,8 @@ def find_session_by_test_name(
             sessions_query=dict(
                 name=dict(contains=test_name),
                 state_filter=["Running"],
-                paging=dict(count=20, paging_token=paging_token)))
+                paging=dict(count=20, paging_token=paging_token)),
+            _request_timeout=SDK_REQUEST_TIMEOUT_S)
 
         for session in result.results:
             logger.info(f"Found sessions {session.name}")
@@ -913,9 +1486,9 @@ def find_session_by_test_name(
             try:
                 session_state = get_remote_json_content(
                     temp_dir=temp_dir,
-                    session_name=session.name,
                     remote_file=state_json,
-                    session_controller=session_controller)
+                    session_files=get_session_files(session.id,
+                                                    session.name))
             except Exception as exc:
                 raise RuntimeError(f"Could not get remote json content "
                                    f"for session {session.name}") from exc
@@ -938,7 +1511,9 @@ def get_latest_running_command_id(sdk: AnyscaleSDK, session_id: str
 
     while not scd_id:
         result = sdk.list_session_commands(
-            session_id=session_id, paging_token=paging_token)
+            session_id=session_id,
+            paging_token=paging_token,
+            _request_timeout=SDK_REQUEST_TIMEOUT_S)
 
         paging_token = result.metadata.next_paging_token
 
@@ -960,143 +1535,644 @@ def get_latest_running_command_id(sdk: AnyscaleSDK, session_id: str
     return scd_id, success or False
 
 
-def run_test_config(
-        local_dir: str,
-        project_id: str,
-        test_name: str,
-        test_config: Dict[Any, Any],
-        smoke_test: bool = False,
-        no_terminate: bool = False,
-        kick_off_only: bool = False,
-        check_progress: bool = False,
-        upload_artifacts: bool = True,
-) -> Dict[Any, Any]:
+class PooledSession:
+    def __init__(self, session_id: str, session_name: str,
+                 sdk: AnyscaleSDK):
+        self.session_id = session_id
+        self.session_name = session_name
+        self.sdk = sdk
+        self.released_at = time.monotonic()
+
+
+class SessionPool:
+    """Idle sessions that can be handed to the next test.
+
+    Sessions are keyed by (compute template ID, build ID), so a session
+    is only reused by tests with the same cluster. Sessions idle for more
+    than `ttl` seconds are evicted and should be stopped by the caller.
     """
 
-    Returns:
-        Dict with the following entries:
-            status (str): One of [finished, error, timeout]
-            command_link (str): Link to command (Anyscale web UI)
-            last_logs (str): Last logs (excerpt) to send to owner
-            artifacts (dict): Dict of artifacts
-                Key: Name
-                Value: S3 URL
+    def __init__(self, ttl: float = SESSION_POOL_TTL_S):
+        self.ttl = ttl
+        self._idle: Dict[Tuple[str, str], List[PooledSession]] = {}
+
+    def acquire(self, key: Tuple[str, str]) -> Optional[PooledSession]:
+        """Take the most recently released session for `key`."""
+        sessions = self._idle.get(key)
+        if not sessions:
+            return None
+        return sessions.pop()
+
+    def release(self, key: Tuple[str, str], session: PooledSession):
+        session.released_at = time.monotonic()
+        self._idle.setdefault(key, []).append(session)
+
+    def evict_expired(self) -> List[PooledSession]:
+        now = time.monotonic()
+        expired = []
+        for key, sessions in self._idle.items():
+            expired += [
+                s for s in sessions if now - s.released_at >= self.ttl
+            ]
+            self._idle[key] = [
+                s for s in sessions if now - s.released_at < self.ttl
+            ]
+        return expired
+
+    def evict_all(self) -> List[PooledSession]:
+        sessions = [s for idle in self._idle.values() for s in idle]
+        self._idle.clear()
+        return sessions
+
+
+class PackedSession:
+    """Session shared by the tests of a pack.
+
+    See `AsyncRunner.run_test_pack`.
     """
-    # Todo (mid-term): Support other cluster definitions (not only cluster configs)
-    cluster_config_rel_path = test_config["cluster"].get(
-        "cluster_config", None)
-    cluster_config = _load_config(local_dir, cluster_config_rel_path)
 
-    app_config_rel_path = test_config["cluster"].get("app_config", None)
-    app_config = _load_config(local_dir, app_config_rel_path)
+    def __init__(self):
+        self.session: Optional[PooledSession] = None
 
-    compute_tpl_rel_path = test_config["cluster"].get("compute_template", None)
-    compute_tpl = _load_config(local_dir, compute_tpl_rel_path)
 
-    stop_event = multiprocessing.Event()
-    result_queue = multiprocessing.Queue()
+class _Phases:
+    """Setup phases of a test, run as tasks on the event loop.
 
-    session_name = f"{test_name}_{int(time.time())}"
+    Each phase is declared with the names of the phases it depends on. It
+    starts as soon as those are done and gets their results as arguments,
+    so independent phases overlap.
+    """
 
-    temp_dir = tempfile.mkdtemp()
+    def __init__(self):
+        self._tasks: Dict[str, asyncio.Future] = {}
 
-    # Result and state files
-    results_json = test_config["run"].get("results", None)
-    if results_json is None:
-        results_json = "/tmp/release_test_out.json"
+    def __contains__(self, name: str) -> bool:
+        return name in self._tasks
 
-    state_json = test_config["run"].get("state", None)
-    if state_json is None:
-        state_json = "/tmp/release_test_state.json"
+    def add(self, name: str, fn: Callable[..., Any], *deps: str):
+        async def _phase():
+            args = [await self._tasks[dep] for dep in deps]
+            return await fn(*args)
 
-    env_vars = {
-        "RAY_ADDRESS": os.environ.get("RAY_ADDRESS", "auto"),
-        "TEST_OUTPUT_JSON": results_json,
-        "TEST_STATE_JSON": state_json,
-        "IS_SMOKE_TEST": "1" if smoke_test else "0",
-    }
+        self._tasks[name] = asyncio.ensure_future(_phase())
 
-    with open(os.path.join(local_dir, ".anyscale.yaml"), "wt") as f:
-        f.write(f"project_id: {project_id}")
-    os.chdir(local_dir)
+    async def result(self, name: str) -> Any:
+        return await self._tasks[name]
 
-    # Setup interface
-    # Unfortunately, there currently seems to be no great way to
-    # transfer files with the Anyscale SDK.
-    # So we use the session controller instead.
-    sdk = AnyscaleSDK(auth_token=GLOBAL_CONFIG["ANYSCALE_CLI_TOKEN"])
+    async def cancel(self):
+        """Cancel all unfinished phases and wait for them."""
+        for task in self._tasks.values():
+            task.cancel()
+        await asyncio.gather(*self._tasks.values(), return_exceptions=True)
 
-    session_controller = SessionController(
-        api_client=instantiate_api_client(
-            cli_token=GLOBAL_CONFIG["ANYSCALE_CLI_TOKEN"],
-            host=GLOBAL_CONFIG["ANYSCALE_HOST"],
-        ),
-        anyscale_api_client=sdk.api_client,
-    )
 
-    timeout = test_config["run"].get("timeout", 1800)
-    if "RELEASE_OVERRIDE_TIMEOUT" in os.environ:
-        previous_timeout = timeout
-        timeout = int(os.environ.get("RELEASE_OVERRIDE_TIMEOUT", str(timeout)))
-        logger.warning(f"Release test timeout override: {timeout} "
-                       f"(would have been {previous_timeout})")
+# The session controller looks up the Anyscale project from the current
+# working directory, so its calls switch into the test's local dir one at
+# a time.
+_project_dir_lock = threading.RLock()
 
-    # If a test is long running, timeout does not mean it failed
-    is_long_running = test_config["run"].get("long_running", False)
 
-    if test_config["run"].get("use_connect"):
-        assert not kick_off_only, \
-            "Unsupported for running with Anyscale connect."
-        install_app_config_packages(app_config)
-        install_matching_ray()
-
-    # Add information to results dict
-    def _update_results(results: Dict):
-        if "last_update" in results:
-            results["last_update_diff"] = time.time() - results["last_update"]
-        if smoke_test:
-            results["smoke_test"] = True
-
-    def _process_finished_command(session_controller: SessionController,
-                                  scd_id: str,
-                                  results: Optional[Dict] = None):
-        logger.info(f"Command finished successfully.")
-        if results_json:
-            results = results or get_remote_json_content(
-                temp_dir=temp_dir,
-                session_name=session_name,
-                remote_file=results_json,
-                session_controller=session_controller,
-            )
-        else:
-            results = {"passed": 1}
+@contextlib.contextmanager
+def _in_project_dir(local_dir: str):
+    with _project_dir_lock:
+        cwd = os.getcwd()
+        os.chdir(local_dir)
+        try:
+            yield
+        finally:
+            os.chdir(cwd)
 
-        _update_results(results)
 
-        if scd_id:
-            logs = get_command_logs(session_controller, scd_id,
-                                    test_config.get("log_lines", 50))
-        else:
-            logs = "No command found to fetch logs for"
-
-        if upload_artifacts:
-            saved_artifacts = pull_artifacts_and_store_in_cloud(
-                temp_dir=temp_dir,
-                logs=logs,  # Also save logs in cloud
-                session_name=session_name,
-                test_name=test_name,
-                artifacts=test_config.get("artifacts", {}),
-                session_controller=session_controller,
-            )
+# Thread pool futures of the blocking calls made by the current test (see
+# `AsyncRunner.call`)
+_test_calls: contextvars.ContextVar = contextvars.ContextVar(
+    "_test_calls", default=None)
 
-            logger.info("Fetched results and stored on the cloud. Returning.")
-        else:
-            saved_artifacts = {}
-            logger.info("Usually I would have fetched the results and "
-                        "artifacts and stored them on S3.")
 
-        result_queue.put(
-            State(
+class AsyncRunner:
+    """Run release tests on a single asyncio event loop.
+
+    Blocking calls (Anyscale SDK, file transfers, subprocesses) run on a
+    bounded thread pool, and builds, sessions and commands are awaited
+    through poller futures. One loop can thus drive the build, session and
+    command phases of many tests at once. At most `max_concurrent_tests`
+    tests are in flight at a time. Each session gets one multiplexed SSH
+    connection (see `SessionFiles`), shared by all transfers until the
+    session is stopped.
+
+    If a `session_pool` is passed, sessions of successful tests are reset
+    and reused by later tests with the same compute template and build
+    instead of being stopped. Call `drain_session_pool` before the loop
+    exits to stop the remaining idle sessions.
+    """
+
+    def __init__(self,
+                 max_concurrent_tests: int = MAX_CONCURRENT_TESTS,
+                 max_workers: int = RUNNER_WORKERS,
+                 session_pool: Optional[SessionPool] = None):
+        self.max_concurrent_tests = max_concurrent_tests
+        self.session_pool = session_pool
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="runner")
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._connect_lock: Optional[asyncio.Lock] = None
+        self._in_flight: Dict[Any, asyncio.Future] = {}
+        self._session_files: Dict[str, SessionFiles] = {}
+
+    def close(self):
+        for files in self._session_files.values():
+            files.close()
+        self._session_files.clear()
+        self._executor.shutdown(wait=False)
+
+    def session_files(self, session_controller: SessionController,
+                      session_id: str, session_name: str,
+                      local_dir: str) -> SessionFiles:
+        """Return the file transfers of a session.
+
+        All tests using the session share one `SessionFiles` and thus one
+        SSH connection until the session is stopped.
+        """
+        return self._session_files.setdefault(
+            session_id,
+            SessionFiles(session_controller, session_id, session_name,
+                         local_dir))
+
+    async def close_session_files(self, session_id: Optional[str]):
+        files = self._session_files.pop(session_id, None)
+        if files is not None:
+            await self.call(files.close)
+
+    async def stop_session(self, sdk: AnyscaleSDK,
+                           session_id: Optional[str]):
+        await self.close_session_files(session_id)
+        await self.call(_cleanup_session, sdk, session_id)
+
+    async def _stop_sessions(self, sessions: List[PooledSession]):
+        for session in sessions:
+            logger.info(f"Stopping idle session {session.session_name}")
+        await asyncio.gather(
+            *(self.stop_session(session.sdk, session.session_id)
+              for session in sessions),
+            return_exceptions=True)
+
+    async def evict_idle_sessions(self):
+        if self.session_pool is not None:
+            await self._stop_sessions(self.session_pool.evict_expired())
+
+    async def drain_session_pool(self):
+        if self.session_pool is not None:
+            await self._stop_sessions(self.session_pool.evict_all())
+
+    async def acquire_session(self, key: Tuple[str, str]
+                              ) -> Optional[PooledSession]:
+        """Take a running session for `key` from the pool, if any."""
+        if self.session_pool is None:
+            return None
+
+        await self.evict_idle_sessions()
+        while True:
+            session = self.session_pool.acquire(key)
+            if session is None:
+                return None
+            try:
+                result = await self.call(
+                    session.sdk.get_session,
+                    session.session_id,
+                    _request_timeout=SDK_REQUEST_TIMEOUT_S)
+                if result.result.state == "Running":
+                    logger.info(f"Reusing pooled session "
+                                f"{session.session_name}")
+                    return session
+            except Exception as e:
+                logger.warning(f"Could not check pooled session "
+                               f"{session.session_name}: {e}")
+            await self._stop_sessions([session])
+
+    async def reset_session(self, session: PooledSession,
+                            reset_cmd: str) -> bool:
+        """Run `reset_cmd` in a session before it is used again."""
+        try:
+            _, future = await self.call(start_session_command, session.sdk,
+                                        session.session_id, reset_cmd, {})
+            _command_status_or_raise(await wait_for_poll_async(
+                future, f"session {session.session_name} to reset"))
+        except Exception as e:
+            logger.warning(f"Could not reset session {session.session_name}, "
+                           f"stopping it: {e}")
+            return False
+        return True
+
+    async def release_session(self, key: Tuple[str, str],
+                              session: PooledSession, reset_cmd: str):
+        """Reset a session with `reset_cmd` and put it into the pool.
+
+        If the reset fails, the session is stopped instead.
+        """
+        if not await self.reset_session(session, reset_cmd):
+            await self._stop_sessions([session])
+            return
+
+        logger.info(f"Returning session {session.session_name} to the pool")
+        self.session_pool.release(key, session)
+        asyncio.get_event_loop().call_later(
+            self.session_pool.ttl,
+            lambda: asyncio.ensure_future(self.evict_idle_sessions()))
+
+    async def call(self, fn: Callable, *args, **kwargs) -> Any:
+        """Run a blocking call on the runner's thread pool.
+
+        Cancelling the caller doesn't stop a call that already started, so
+        calls are tracked per test and awaited before the test's temp dir
+        is removed (see `_wait_for_test_calls`).
+        """
+        future = self._executor.submit(fn, *args, **kwargs)
+        test_calls = _test_calls.get()
+        if test_calls is not None:
+            test_calls.add(future)
+            future.add_done_callback(test_calls.discard)
+        return await asyncio.wrap_future(future)
+
+    async def _wait_for_test_calls(self, test_calls: Set[Future]):
+        if test_calls:
+            logger.info(f"Waiting for {len(test_calls)} running calls of "
+                        f"the test to finish...")
+            await asyncio.wait(
+                [asyncio.wrap_future(future) for future in list(test_calls)])
+
+    async def single_flight(self, key: Any, fn: Callable[[], Any]) -> Any:
+        """Share one call of the coroutine function `fn` per `key`.
+
+        Concurrent tests looking up the same resource (e.g. the same app
+        config) wait for a single lookup instead of racing to create it.
+        """
+        future = self._in_flight.get(key)
+        if future is None:
+            future = asyncio.ensure_future(fn())
+            self._in_flight[key] = future
+            future.add_done_callback(
+                lambda _: self._in_flight.pop(key, None))
+        return await asyncio.shield(future)
+
+    async def call_in_dir(self, local_dir: str, fn: Callable, *args,
+                          **kwargs) -> Any:
+        """Like `call`, but with `local_dir` as working directory."""
+
+        def _call():
+            with _in_project_dir(local_dir):
+                return fn(*args, **kwargs)
+
+        return await self.call(_call)
+
+    async def wait_for_build_or_raise(self, sdk: AnyscaleSDK,
+                                      app_config_id: Optional[str]
+                                      ) -> Optional[str]:
+        if not app_config_id:
+            return None
+
+        build_id, future = await self.call(find_build, sdk, app_config_id)
+        return await wait_for_poll_async(future,
+                                         f"build {build_id} to finish")
+
+    async def create_and_wait_for_session(
+            self,
+            sdk: AnyscaleSDK,
+            stop_event: threading.Event,
+            session_name: str,
+            session_options: Dict[Any, Any],
+    ) -> str:
+        session_id, future = await self.call(start_session, sdk,
+                                             session_name, session_options)
+        await wait_for_poll_async(future, f"session {session_name}",
+                                  stop_event)
+        return session_id
+
+    async def run_session_command(self,
+                                  sdk: AnyscaleSDK,
+                                  session_id: str,
+                                  cmd_to_run: str,
+                                  stop_event: threading.Event,
+                                  result_queue: asyncio.Queue,
+                                  env_vars: Dict[str, str],
+                                  state_str: str = "CMD_RUN",
+                                  kick_off_only: bool = False,
+                                  session_controller: Optional[
+                                      SessionController] = None,
+                                  log_spool: Optional[str] = None
+                                  ) -> Tuple[str, int]:
+        """Run a command in a session and wait for it to finish.
+
+        If `session_controller` and `log_spool` are passed, the command's
+        logs are appended to the `log_spool` file while it runs (see
+        `CommandLogTail`).
+        """
+        result_queue.put_nowait(State(state_str, time.time(), None))
+        scd_id, future = await self.call(start_session_command, sdk,
+                                         session_id, cmd_to_run, env_vars,
+                                         kick_off_only)
+
+        if kick_off_only:
+            return scd_id, 0
+
+        waiter = asyncio.ensure_future(
+            wait_for_poll_async(future, "command to finish", stop_event))
+        if session_controller is not None and log_spool:
+            tail = CommandLogTail(session_controller, scd_id, log_spool)
+            try:
+                while not waiter.done():
+                    await asyncio.wait({waiter}, timeout=LOG_TAIL_INTERVAL_S)
+                    await self._poll_log_tail(tail)
+            finally:
+                waiter.cancel()
+
+        result = await waiter
+        return scd_id, _command_status_or_raise(result)
+
+    async def _poll_log_tail(self, tail: CommandLogTail):
+        try:
+            await self.call(tail.poll)
+        except Exception as e:
+            logger.warning(f"Could not fetch new logs of command "
+                           f"{tail.scd_id}: {e}")
+
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrent_tests)
+        return self._semaphore
+
+    def _get_connect_lock(self) -> asyncio.Lock:
+        if self._connect_lock is None:
+            self._connect_lock = asyncio.Lock()
+        return self._connect_lock
+
+    async def sync_to_session(self, sdk: AnyscaleSDK,
+                              session_files: SessionFiles, local_dir: str,
+                              local_files: Dict[str, str],
+                              extra_files: Dict[str, str], temp_dir: str):
+        """Send changed files of `local_dir` to a session in one batch.
+
+        `local_files` are the content hashes of `local_dir` (see
+        `hash_tree`). Only files that differ from the session's manifest
+        are sent. `extra_files` maps remote paths to local files that are
+        always sent along, e.g. the test state file.
+
+        The session checks that the files left out are still unchanged.
+        If not, e.g. because an earlier test on a reused session modified
+        them, all files are sent again.
+        """
+        manifest = SessionManifest(session_files.session_id)
+        remote_files = manifest.load()
+        try:
+            await self._push_files(sdk, session_files, local_dir,
+                                   local_files, remote_files, extra_files,
+                                   temp_dir)
+        except Exception as e:
+            if not remote_files:
+                raise
+            logger.warning(f"Files on session {session_files.session_name} "
+                           f"differ from the ones sent before, sending all "
+                           f"files: {e}")
+            remote_files = {}
+            manifest.save(remote_files)
+            await self._push_files(sdk, session_files, local_dir,
+                                   local_files, remote_files, extra_files,
+                                   temp_dir)
+
+        remote_files.update(local_files)
+        manifest.save(remote_files)
+
+    async def _push_files(self, sdk: AnyscaleSDK, session_files: SessionFiles,
+                          local_dir: str, local_files: Dict[str, str],
+                          remote_files: Dict[str, str],
+                          extra_files: Dict[str, str], temp_dir: str):
+        session_id = session_files.session_id
+        session_name = session_files.session_name
+        changed = changed_files(local_files, remote_files)
+        expected = {
+            path: digest
+            for path, digest in local_files.items() if path not in changed
+        }
+        logger.info(f"Syncing {len(changed)} changed of {len(local_files)} "
+                    f"files and {len(extra_files)} extra files to session...")
+
+        archive = os.path.join(temp_dir, f"sync_{session_id}.tar.gz")
+        await self.call(build_archive, local_dir, changed, extra_files,
+                        archive, expected)
+        remote_archive = f"/tmp/{os.path.basename(archive)}"
+        await self.call(session_files.push, archive, remote_archive)
+        os.remove(archive)
+
+        # Also record the working dir for transfers of relative paths
+        cmd = unpack_command(remote_archive, extra_files, bool(expected)) + \
+            f" && pwd > {SESSION_WORKDIR_FILE}"
+        _, future = await self.call(start_session_command, sdk, session_id,
+                                    cmd, {})
+        _command_status_or_raise(await wait_for_poll_async(
+            future, f"files to be unpacked on session {session_name}"))
+
+    async def run_test_config(self, local_dir: str, project_id: str,
+                              test_name: str, test_config: Dict[Any, Any],
+                              **kwargs) -> Dict[Any, Any]:
+        """Run a release test once a slot is free.
+
+        Takes the same arguments as `run_test_config`. Tests using
+        Anyscale connect install their packages into this process and run
+        their script locally, so only one of them runs at a time.
+        """
+        run = functools.partial(self._run_test_config, local_dir, project_id,
+                                test_name, test_config, **kwargs)
+        if test_config["run"].get("use_connect"):
+            async with self._get_connect_lock():
+                async with self._get_semaphore():
+                    return await run()
+        async with self._get_semaphore():
+            return await run()
+
+    async def run_test_pack(
+            self,
+            local_dir: str,
+            project_id: str,
+            tests: List[Tuple[str, Dict[Any, Any], bool]],
+            no_terminate: bool = False,
+            upload_artifacts: bool = True,
+            on_result: Optional[Callable[[int, Dict[Any, Any]], Any]] = None
+    ) -> List[Dict[Any, Any]]:
+        """Run several tests one after another on one session.
+
+        `tests` are ``(test_name, test_config, smoke_test)`` tuples that
+        share `local_dir`, app config and compute template. The session is
+        started once, and later tests only sync files that changed. Each
+        test still runs its own prepare and
+        script commands and gets its own result, which is passed to the
+        `on_result` coroutine function (with the test's index) as soon as
+        it is available. If a test doesn't finish successfully, its
+        session is stopped and the next test starts a new one.
+
+        The pack takes a single slot of the runner.
+        """
+        packed_session = PackedSession()
+        results = []
+        async with self._get_semaphore():
+            try:
+                for i, (test_name, test_config, smoke_test) in enumerate(tests):
+                    result = await self._run_test_config(
+                        local_dir,
+                        project_id,
+                        test_name,
+                        test_config,
+                        smoke_test=smoke_test,
+                        no_terminate=no_terminate,
+                        upload_artifacts=upload_artifacts,
+                        packed_session=packed_session)
+                    results.append(result)
+                    if on_result is not None:
+                        await on_result(i, result)
+            finally:
+                if packed_session.session is not None and not no_terminate:
+                    await self._stop_sessions([packed_session.session])
+        return results
+
+    async def _run_test_config(
+            self,
+            local_dir: str,
+            project_id: str,
+            test_name: str,
+            test_config: Dict[Any, Any],
+            smoke_test: bool = False,
+            no_terminate: bool = False,
+            kick_off_only: bool = False,
+            check_progress: bool = False,
+            upload_artifacts: bool = True,
+            packed_session: Optional[PackedSession] = None,
+    ) -> Dict[Any, Any]:
+        # Todo (mid-term): Support other cluster definitions (not only cluster configs)
+        cluster_config_rel_path = test_config["cluster"].get(
+            "cluster_config", None)
+        cluster_config = _load_config(local_dir, cluster_config_rel_path)
+
+        app_config_rel_path = test_config["cluster"].get("app_config", None)
+        app_config = _load_config(local_dir, app_config_rel_path)
+
+        compute_tpl_rel_path = test_config["cluster"].get(
+            "compute_template", None)
+        compute_tpl = _load_config(local_dir, compute_tpl_rel_path)
+
+        stop_event = threading.Event()
+        result_queue = asyncio.Queue()
+
+        session_name = f"{test_name}_{int(time.time())}"
+
+        temp_dir = tempfile.mkdtemp()
+
+        use_connect = test_config["run"].get("use_connect")
+
+        # Result and state files. With connect, the script runs locally, so
+        # each test gets its own files instead of sharing the ones in /tmp
+        results_json = test_config["run"].get("results", None)
+        if results_json is None:
+            results_json = os.path.join(temp_dir, "release_test_out.json") \
+                if use_connect else "/tmp/release_test_out.json"
+
+        state_json = test_config["run"].get("state", None)
+        if state_json is None:
+            state_json = os.path.join(temp_dir, "release_test_state.json") \
+                if use_connect else "/tmp/release_test_state.json"
+
+        # Full logs of the prepare and script commands (fetched while they
+        # run), or of the script's local process when using connect
+        log_spool = os.path.join(temp_dir, "command.log")
+
+        env_vars = {
+            "RAY_ADDRESS": os.environ.get("RAY_ADDRESS", "auto"),
+            "TEST_OUTPUT_JSON": results_json,
+            "TEST_STATE_JSON": state_json,
+            "IS_SMOKE_TEST": "1" if smoke_test else "0",
+        }
+
+        with open(os.path.join(local_dir, ".anyscale.yaml"), "wt") as f:
+            f.write(f"project_id: {project_id}")
+
+        # Setup interface
+        # Unfortunately, there currently seems to be no great way to
+        # transfer files with the Anyscale SDK.
+        # So we use the session controller instead.
+        sdk = AnyscaleSDK(auth_token=GLOBAL_CONFIG["ANYSCALE_CLI_TOKEN"])
+
+        session_controller = SessionController(
+            api_client=instantiate_api_client(
+                cli_token=GLOBAL_CONFIG["ANYSCALE_CLI_TOKEN"],
+                host=GLOBAL_CONFIG["ANYSCALE_HOST"],
+            ),
+            anyscale_api_client=sdk.api_client,
+        )
+
+        timeout = test_config["run"].get("timeout", 1800)
+        if "RELEASE_OVERRIDE_TIMEOUT" in os.environ:
+            previous_timeout = timeout
+            timeout = int(
+                os.environ.get("RELEASE_OVERRIDE_TIMEOUT", str(timeout)))
+            logger.warning(f"Release test timeout override: {timeout} "
+                           f"(would have been {previous_timeout})")
+
+        # If a test is long running, timeout does not mean it failed
+        is_long_running = test_config["run"].get("long_running", False)
+
+        if use_connect:
+            assert not kick_off_only, \
+                "Unsupported for running with Anyscale connect."
+            await self.call(install_app_config_packages, app_config)
+            await self.call(install_matching_ray)
+            env_vars = dict(app_config.get("env_vars", {}), **env_vars)
+
+        # Add information to results dict
+        def _update_results(results: Dict):
+            if "last_update" in results:
+                results["last_update_diff"] = time.time(
+                ) - results["last_update"]
+            if smoke_test:
+                results["smoke_test"] = True
+
+        def _process_finished_command(session_controller: SessionController,
+                                      session_files: SessionFiles,
+                                      scd_id: str,
+                                      results: Optional[Dict] = None):
+            logger.info(f"Command finished successfully.")
+            if results_json:
+                results = results or get_remote_json_content(
+                    temp_dir=temp_dir,
+                    remote_file=results_json,
+                    session_files=session_files,
+                )
+            else:
+                results = {"passed": 1}
+
+            _update_results(results)
+
+            if scd_id:
+                logs = get_command_logs(session_controller, scd_id,
+                                        test_config.get("log_lines", 50))
+            else:
+                logs = "No command found to fetch logs for"
+
+            if upload_artifacts:
+                saved_artifacts = pull_artifacts_and_store_in_cloud(
+                    temp_dir=temp_dir,
+                    logs=logs,  # Also save logs in cloud
+                    session_name=session_name,
+                    test_name=test_name,
+                    artifacts=test_config.get("artifacts", {}),
+                    session_files=session_files,
+                    log_spool=log_spool,
+                )
+
+                logger.info(
+                    "Fetched results and stored on the cloud. Returning.")
+            else:
+                saved_artifacts = {}
+                logger.info("Usually I would have fetched the results and "
+                            "artifacts and stored them on S3.")
+
+            return State(
                 "END",
                 time.time(),
                 {
@@ -1105,39 +2181,39 @@ def run_test_config(
                     "results": results,
                     "artifacts": saved_artifacts,
                 },
-            ))
-
-    # When running the test script in client mode, the finish command is a
-    # completed local process.
-    def _process_finished_client_command(returncode: int, logs: str):
-        if upload_artifacts:
-            saved_artifacts = pull_artifacts_and_store_in_cloud(
-                temp_dir=temp_dir,
-                logs=logs,  # Also save logs in cloud
-                session_name=session_name,
-                test_name=test_name,
-                artifacts=None,
-                session_controller=None,
             )
-            logger.info("Stored results on the cloud. Returning.")
-        else:
-            saved_artifacts = {}
-            logger.info("Usually I would have fetched the results and "
-                        "artifacts and stored them on S3.")
 
-        if results_json:
-            results = get_local_json_content(local_file=results_json, )
-        else:
-            results = {
-                "passed": int(returncode == 0),
-            }
+        # When running the test script in client mode, the finish command is a
+        # completed local process.
+        def _process_finished_client_command(returncode: int, logs: str):
+            if upload_artifacts:
+                saved_artifacts = pull_artifacts_and_store_in_cloud(
+                    temp_dir=temp_dir,
+                    logs=logs,  # Also save logs in cloud
+                    session_name=session_name,
+                    test_name=test_name,
+                    artifacts=None,
+                    session_files=None,
+                    log_spool=log_spool,
+                )
+                logger.info("Stored results on the cloud. Returning.")
+            else:
+                saved_artifacts = {}
+                logger.info("Usually I would have fetched the results and "
+                            "artifacts and stored them on S3.")
+
+            if results_json:
+                results = get_local_json_content(local_file=results_json, )
+            else:
+                results = {
+                    "passed": int(returncode == 0),
+                }
 
-        results["returncode"]: returncode
+            results["returncode"]: returncode
 
-        _update_results(results)
+            _update_results(results)
 
-        result_queue.put(
-            State(
+            return State(
                 "END",
                 time.time(),
                 {
@@ -1146,420 +2222,644 @@ def run_test_config(
                     "results": results,
                     "artifacts": saved_artifacts,
                 },
-            ))
+            )
 
-    def _run(logger):
-        anyscale.conf.CLI_TOKEN = GLOBAL_CONFIG["ANYSCALE_CLI_TOKEN"]
+        # Run before a session is handed to another test
+        reset_cmd = f"rm -f {results_json} {state_json}"
+        if SESSION_RESET_CMD:
+            reset_cmd += f" && {SESSION_RESET_CMD}"
 
-        session_id = None
-        scd_id = None
-        try:
-            # First, look for running sessions
-            session_id = search_running_session(sdk, project_id, session_name)
-            compute_tpl_name = None
-            app_config_name = None
-            if not session_id:
-                logger.info("No session found.")
-                # Start session
-                session_options = dict(
-                    name=session_name, project_id=project_id)
-
-                if cluster_config is not None:
-                    logging.info("Starting session with cluster config")
-                    cluster_config_str = json.dumps(cluster_config)
-                    session_options["cluster_config"] = cluster_config_str
-                    session_options["cloud_id"] = (
-                        GLOBAL_CONFIG["ANYSCALE_CLOUD_ID"], )
-                    session_options["uses_app_config"] = False
-                else:
-                    logging.info("Starting session with app/compute config")
+        async def _run():
+            anyscale.conf.CLI_TOKEN = GLOBAL_CONFIG["ANYSCALE_CLI_TOKEN"]
 
-                    # Find/create compute template
-                    compute_tpl_id, compute_tpl_name = create_or_find_compute_template(
-                        sdk, project_id, compute_tpl)
+            session_id = None
+            scd_id = None
+            pool_key = None
+            succeeded = False
+            phases = _Phases()
+            try:
+                # Setup phases start as soon as their dependencies are done
+                compute_tpl_name = None
+                app_config_name = None
 
+                async def _find_compute_tpl():
+                    # Find/create compute template
+                    compute_tpl_id, compute_tpl_name = await self.single_flight(
+                        ("compute_tpl", project_id, _dict_hash(compute_tpl)),
+                        lambda: self.call(create_or_find_compute_template,
+                                          sdk, project_id, compute_tpl))
                     logger.info(
                         f"Link to compute template: {anyscale_compute_tpl_url(compute_tpl_id)}"
                     )
+                    return compute_tpl_id, compute_tpl_name
 
+                async def _find_app_config():
                     # Find/create app config
-                    app_config_id, app_config_name = create_or_find_app_config(
-                        sdk, project_id, app_config)
-                    build_id = wait_for_build_or_raise(sdk, app_config_id)
-
-                    session_options["compute_template_id"] = compute_tpl_id
-                    session_options["build_id"] = build_id
-                    session_options["uses_app_config"] = True
-
-                if not test_config["run"].get("use_connect"):
-                    session_id = create_and_wait_for_session(
+                    return await self.single_flight(
+                        ("app_config", project_id, _dict_hash(app_config)),
+                        lambda: self.call(create_or_find_app_config, sdk,
+                                          project_id, app_config))
+
+                async def _wait_for_build(app_config_result):
+                    app_config_id, _ = app_config_result
+                    return await self.single_flight(
+                        ("build", app_config_id),
+                        lambda: self.wait_for_build_or_raise(
+                            sdk, app_config_id))
+
+                async def _start_session(running_session_id,
+                                         compute_tpl_result=None,
+                                         build_id=None):
+                    nonlocal session_name, pool_key
+                    if running_session_id:
+                        return running_session_id
+
+                    logger.info("No session found.")
+                    # Start session
+                    session_options = dict(
+                        name=session_name, project_id=project_id)
+
+                    if cluster_config is not None:
+                        logging.info("Starting session with cluster config")
+                        cluster_config_str = json.dumps(cluster_config)
+                        session_options["cluster_config"] = cluster_config_str
+                        session_options["cloud_id"] = (
+                            GLOBAL_CONFIG["ANYSCALE_CLOUD_ID"], )
+                        session_options["uses_app_config"] = False
+                    else:
+                        logging.info(
+                            "Starting session with app/compute config")
+                        compute_tpl_id, _ = compute_tpl_result
+                        session_options["compute_template_id"] = compute_tpl_id
+                        session_options["build_id"] = build_id
+                        session_options["uses_app_config"] = True
+
+                        if self.session_pool is not None and \
+                                packed_session is None:
+                            pool_key = (compute_tpl_id, build_id)
+                            pooled = await self.acquire_session(pool_key)
+                            if pooled:
+                                session_name = pooled.session_name
+                                return pooled.session_id
+
+                    return await self.create_and_wait_for_session(
                         sdk=sdk,
                         stop_event=stop_event,
                         session_name=session_name,
                         session_options=session_options,
                     )
 
-            if test_config["run"].get("use_connect"):
-                assert compute_tpl_name, "Compute template must exist."
-                assert app_config_name, "Cluster environment must exist."
-                script_args = test_config["run"].get("args", [])
-                if smoke_test:
-                    script_args += ["--smoke-test"]
-                min_workers = 0
-                for node_type in compute_tpl["worker_node_types"]:
-                    min_workers += node_type["min_workers"]
-                returncode, logs = run_job(
-                    cluster_name=test_name,
-                    compute_tpl_name=compute_tpl_name,
-                    cluster_env_name=app_config_name,
-                    job_name=session_name,
-                    min_workers=min_workers,
-                    script=test_config["run"]["script"],
-                    script_args=script_args,
-                    env_vars=env_vars)
-                _process_finished_client_command(returncode, logs)
-                return
+                async def _join_pack():
+                    nonlocal session_name
+                    session_name = packed_session.session.session_name
+                    logger.info(f"Running test on the pack's session "
+                                f"{session_name}")
+                    return packed_session.session.session_id
+
+                async def _sync_local_dir(session_id, local_files):
+                    # Write test state json
+                    test_state_file = os.path.join(temp_dir,
+                                                   "test_state.json")
+                    with open(test_state_file, "wt") as f:
+                        json.dump({
+                            "start_time": time.time(),
+                            "test_name": test_name
+                        }, f)
+
+                    # Send changed files and the test state in one batch
+                    await self.sync_to_session(
+                        sdk,
+                        self.session_files(session_controller, session_id,
+                                           session_name, local_dir),
+                        local_dir, local_files, {state_json: test_state_file},
+                        temp_dir)
+
+                packed = packed_session is not None and packed_session.session
+                if not packed:
+                    phases.add("running_session", lambda: self.call(
+                        search_running_session, sdk, project_id, session_name))
+                    if cluster_config is None:
+                        phases.add("compute_tpl", _find_compute_tpl)
+                        phases.add("app_config", _find_app_config)
+                        phases.add("build", _wait_for_build, "app_config")
+
+                if not use_connect:
+                    if packed:
+                        phases.add("session", _join_pack)
+                    else:
+                        phases.add("session", _start_session,
+                                   "running_session",
+                                   *(["compute_tpl", "build"]
+                                     if cluster_config is None else []))
+                    # The local dir is hashed while the cluster boots
+                    phases.add("manifest",
+                               lambda: self.call(hash_tree, local_dir))
+                    phases.add("sync", _sync_local_dir, "session", "manifest")
+
+                if use_connect:
+                    if "compute_tpl" in phases:
+                        _, compute_tpl_name = await phases.result(
+                            "compute_tpl")
+                        _, app_config_name = await phases.result(
+                            "app_config")
+                        await phases.result("build")
+                    assert compute_tpl_name, "Compute template must exist."
+                    assert app_config_name, "Cluster environment must exist."
+
+                    script_args = test_config["run"].get("args", [])
+                    if smoke_test:
+                        script_args += ["--smoke-test"]
+                    min_workers = 0
+                    for node_type in compute_tpl["worker_node_types"]:
+                        min_workers += node_type["min_workers"]
+                    returncode, logs = await self.call(
+                        run_job,
+                        cluster_name=test_name,
+                        compute_tpl_name=compute_tpl_name,
+                        cluster_env_name=app_config_name,
+                        job_name=session_name,
+                        min_workers=min_workers,
+                        script=test_config["run"]["script"],
+                        script_args=script_args,
+                        env_vars=env_vars,
+                        cwd=local_dir,
+                        log_file=log_spool,
+                        log_lines=test_config.get("log_lines", 50),
+                        stop_event=stop_event)
+                    result_queue.put_nowait(await self.call_in_dir(
+                        local_dir, _process_finished_client_command,
+                        returncode, logs))
+                    return
 
-            # Write test state json
-            test_state_file = os.path.join(local_dir, "test_state.json")
-            with open(test_state_file, "wt") as f:
-                json.dump({
-                    "start_time": time.time(),
-                    "test_name": test_name
-                }, f)
-
-            # Rsync up
-            logger.info("Syncing files to session...")
-            session_controller.push(
-                session_name=session_name,
-                source=None,
-                target=None,
-                config=None,
-                all_nodes=False,
-            )
+                session_id = await phases.result("session")
+                if packed_session is not None and not packed:
+                    packed_session.session = PooledSession(
+                        session_id, session_name, sdk)
 
-            logger.info("Syncing test state to session...")
-            session_controller.push(
-                session_name=session_name,
-                source=test_state_file,
-                target=state_json,
-                config=None,
-                all_nodes=False,
-            )
+                await phases.result("sync")
 
-            _check_stop(stop_event)
+                _check_stop(stop_event)
 
-            # Optionally run preparation command
-            prepare_command = test_config["run"].get("prepare")
-            if prepare_command:
-                logger.info(f"Running preparation command: {prepare_command}")
-                run_session_command(
+                # Optionally run preparation command
+                prepare_command = test_config["run"].get("prepare")
+                if prepare_command:
+                    logger.info(
+                        f"Running preparation command: {prepare_command}")
+                    await self.run_session_command(
+                        sdk=sdk,
+                        session_id=session_id,
+                        cmd_to_run=prepare_command,
+                        stop_event=stop_event,
+                        result_queue=result_queue,
+                        env_vars=env_vars,
+                        state_str="CMD_PREPARE",
+                        session_controller=session_controller,
+                        log_spool=log_spool)
+
+                # Run release test command
+                cmd_to_run = test_config["run"]["script"] + " "
+
+                args = test_config["run"].get("args", [])
+                if args:
+                    cmd_to_run += " ".join(args) + " "
+
+                if smoke_test:
+                    cmd_to_run += " --smoke-test"
+
+                scd_id, status_code = await self.run_session_command(
                     sdk=sdk,
                     session_id=session_id,
-                    cmd_to_run=prepare_command,
+                    cmd_to_run=cmd_to_run,
                     stop_event=stop_event,
                     result_queue=result_queue,
                     env_vars=env_vars,
-                    state_str="CMD_PREPARE")
-
-            # Run release test command
-            cmd_to_run = test_config["run"]["script"] + " "
+                    state_str="CMD_RUN",
+                    kick_off_only=kick_off_only,
+                    session_controller=session_controller,
+                    log_spool=log_spool)
+
+                if not kick_off_only:
+                    result_queue.put_nowait(await self.call(
+                        _process_finished_command,
+                        session_controller=session_controller,
+                        session_files=self.session_files(
+                            session_controller, session_id, session_name,
+                            local_dir),
+                        scd_id=scd_id))
+                    succeeded = True
+                else:
+                    result_queue.put_nowait(
+                        State("END", time.time(), {
+                            "status": "kickoff",
+                            "last_logs": ""
+                        }))
+
+            except (ReleaseTestTimeoutError, Exception) as e:
+                logger.error(e, exc_info=True)
+
+                logs = str(e)
+                if scd_id is not None:
+                    try:
+                        logs = await self.call(
+                            get_command_logs, session_controller, scd_id,
+                            test_config.get("log_lines", 50))
+                    except Exception as e2:
+                        logger.error(e2, exc_info=True)
+
+                # Long running tests are "finished" successfully when
+                # timed out
+                if isinstance(e, ReleaseTestTimeoutError) and is_long_running:
+                    result_queue.put_nowait(await self.call(
+                        _process_finished_command,
+                        session_controller=session_controller,
+                        session_files=self.session_files(
+                            session_controller, session_id, session_name,
+                            local_dir),
+                        scd_id=scd_id))
+                else:
+                    result_queue.put_nowait(
+                        State("END", time.time(), {
+                            "status": "timeout",
+                            "last_logs": logs
+                        }))
+            finally:
+                await phases.cancel()
+                if no_terminate:
+                    logger.warning(
+                        "`no_terminate` is set to True, so the session will "
+                        "*not* be terminated!")
+                elif succeeded and packed_session is not None:
+                    # The pack stops its session after the last test
+                    if not await self.reset_session(packed_session.session,
+                                                    reset_cmd):
+                        await self._stop_sessions([packed_session.session])
+                        packed_session.session = None
+                elif succeeded and pool_key is not None:
+                    await self.release_session(
+                        pool_key, PooledSession(session_id, session_name, sdk),
+                        reset_cmd)
+                else:
+                    await self.stop_session(sdk, session_id)
+                    if packed_session is not None:
+                        packed_session.session = None
 
-            args = test_config["run"].get("args", [])
-            if args:
-                cmd_to_run += " ".join(args) + " "
+        async def _check_progress():
+            anyscale.conf.CLI_TOKEN = GLOBAL_CONFIG["ANYSCALE_CLI_TOKEN"]
 
-            if smoke_test:
-                cmd_to_run += " --smoke-test"
-
-            scd_id, status_code = run_session_command(
-                sdk=sdk,
-                session_id=session_id,
-                cmd_to_run=cmd_to_run,
-                stop_event=stop_event,
-                result_queue=result_queue,
-                env_vars=env_vars,
-                state_str="CMD_RUN",
-                kick_off_only=kick_off_only)
-
-            if not kick_off_only:
-                _process_finished_command(
-                    session_controller=session_controller, scd_id=scd_id)
-            else:
-                result_queue.put(
-                    State("END", time.time(), {
-                        "status": "kickoff",
-                        "last_logs": ""
-                    }))
+            should_terminate = False
+            session_id = None
+            scd_id = None
+            candidate_ids = []
 
-        except (ReleaseTestTimeoutError, Exception) as e:
-            logger.error(e, exc_info=True)
+            def _candidate_files(candidate_id: str, candidate_name: str):
+                candidate_ids.append(candidate_id)
+                return self.session_files(session_controller, candidate_id,
+                                          candidate_name, local_dir)
 
-            logs = str(e)
-            if scd_id is not None:
-                try:
-                    logs = get_command_logs(session_controller, scd_id,
-                                            test_config.get("log_lines", 50))
-                except Exception as e2:
-                    logger.error(e2, exc_info=True)
-
-            # Long running tests are "finished" successfully when
-            # timed out
-            if isinstance(e, ReleaseTestTimeoutError) and is_long_running:
-                _process_finished_command(
-                    session_controller=session_controller, scd_id=scd_id)
-            else:
-                result_queue.put(
-                    State("END", time.time(), {
-                        "status": "timeout",
-                        "last_logs": logs
-                    }))
-        finally:
-            if no_terminate:
-                logger.warning(
-                    "`no_terminate` is set to True, so the session will "
-                    "*not* be terminated!")
-            else:
-                _cleanup_session(sdk, session_id)
+            try:
+                existing_session = await self.call(
+                    find_session_by_test_name,
+                    sdk=sdk,
+                    get_session_files=_candidate_files,
+                    temp_dir=temp_dir,
+                    state_json=state_json,
+                    project_id=project_id,
+                    test_name=test_name)
+
+                if existing_session is None:
+                    logger.info(f"Found no existing session for {test_name}")
+                    result_queue.put_nowait(
+                        State("END", time.time(), {
+                            "status": "nosession",
+                            "last_logs": ""
+                        }))
+                    return
 
-    def _check_progress(logger):
-        anyscale.conf.CLI_TOKEN = GLOBAL_CONFIG["ANYSCALE_CLI_TOKEN"]
+                session_id, session_name, session_state = existing_session
+                session_files = self.session_files(
+                    session_controller, session_id, session_name, local_dir)
 
-        should_terminate = False
-        session_id = None
-        scd_id = None
-        try:
-            existing_session = find_session_by_test_name(
-                sdk=sdk,
-                session_controller=session_controller,
-                temp_dir=temp_dir,
-                state_json=state_json,
-                project_id=project_id,
-                test_name=test_name)
-
-            if existing_session is None:
-                logger.info(f"Found no existing session for {test_name}")
-                result_queue.put(
-                    State("END", time.time(), {
-                        "status": "nosession",
-                        "last_logs": ""
-                    }))
-                return
+                logger.info(f"Found existing session for {test_name}: "
+                            f"{session_name}")
 
-            session_id, session_name, session_state = existing_session
+                scd_id, success = await self.call(
+                    get_latest_running_command_id,
+                    sdk=sdk,
+                    session_id=session_id)
 
-            logger.info(f"Found existing session for {test_name}: "
-                        f"{session_name}")
+                latest_result = await self.call(
+                    get_remote_json_content,
+                    temp_dir=temp_dir,
+                    remote_file=results_json,
+                    session_files=session_files,
+                )
+
+                # Fetch result json and check if it has been updated recently
+                result_time_key = test_config["run"].get("time_key", None)
+                maximum_update_delay = test_config["run"].get(
+                    "max_update_delay", None)
+
+                if result_time_key and maximum_update_delay:
+                    last_update = latest_result.get(result_time_key, None)
+
+                    if not last_update:
+                        result_queue.put_nowait(
+                            State(
+                                "END", time.time(), {
+                                    "status": "error",
+                                    "last_logs": f"Test did not store {result_time_key} in the "
+                                    f"results json."
+                                }))
+                        return
+
+                    delay = time.time() - last_update
+                    logger.info(f"Last update was at {last_update:.2f}. "
+                                f"This was {delay:.2f} seconds ago "
+                                f"(maximum allowed: {maximum_update_delay})")
+
+                    if delay > maximum_update_delay:
+                        raise RuntimeError(
+                            f"Test did not update the results json within "
+                            f"the last {maximum_update_delay} seconds.")
+
+                if time.time() - session_state["start_time"] > timeout:
+                    # Long running test reached timeout
+                    logger.info(f"Test command reached timeout after "
+                                f"{timeout} seconds")
+                    result_queue.put_nowait(await self.call(
+                        _process_finished_command,
+                        session_controller=session_controller,
+                        session_files=session_files,
+                        scd_id=scd_id,
+                        results=latest_result))
+                    should_terminate = True
+
+                elif success:
+                    logger.info("All commands finished.")
+                    result_queue.put_nowait(await self.call(
+                        _process_finished_command,
+                        session_controller=session_controller,
+                        session_files=session_files,
+                        scd_id=scd_id,
+                        results=latest_result))
+                    should_terminate = True
 
-            scd_id, success = get_latest_running_command_id(
-                sdk=sdk, session_id=session_id)
+                else:
+                    rest_time = timeout - time.time() + session_state[
+                        "start_time"]
+                    logger.info(f"Test command should continue running "
+                                f"for {rest_time} seconds")
+                    result_queue.put_nowait(
+                        State("END", time.time(), {
+                            "status": "kickoff",
+                            "last_logs": "Test is still running"
+                        }))
 
-            latest_result = get_remote_json_content(
-                temp_dir=temp_dir,
-                session_name=session_name,
-                remote_file=results_json,
-                session_controller=session_controller,
-            )
+            except Exception as e:
+                logger.error(e, exc_info=True)
+
+                logs = str(e)
+                if scd_id is not None:
+                    try:
+                        logs = await self.call(
+                            get_command_logs, session_controller, scd_id,
+                            test_config.get("log_lines", 50))
+                        logs += f"\n{str(e)}"
+                    except Exception as e2:
+                        logger.error(e2, exc_info=True)
+
+                result_queue.put_nowait(
+                    State("END", time.time(), {
+                        "status": "error",
+                        "last_logs": logs
+                    }))
+                should_terminate = True
+            finally:
+                for candidate_id in candidate_ids:
+                    await self.close_session_files(candidate_id)
+                if should_terminate:
+                    logger.warning("Terminating session")
+                    await self.stop_session(sdk, session_id)
 
-            # Fetch result json and check if it has been updated recently
-            result_time_key = test_config["run"].get("time_key", None)
-            maximum_update_delay = test_config["run"].get(
-                "max_update_delay", None)
-
-            if result_time_key and maximum_update_delay:
-                last_update = latest_result.get(result_time_key, None)
-
-                if not last_update:
-                    result_queue.put(
-                        State(
-                            "END", time.time(), {
-                                "status": "error",
-                                "last_logs": f"Test did not store {result_time_key} in the "
-                                f"results json."
-                            }))
-                    return
+        build_timeout = test_config["run"].get("build_timeout", 1800)
 
-                delay = time.time() - last_update
-                logger.info(f"Last update was at {last_update:.2f}. "
-                            f"This was {delay:.2f} seconds ago "
-                            f"(maximum allowed: {maximum_update_delay})")
+        logger.info(
+            f"Link to project: {anyscale_project_url(project_id=GLOBAL_CONFIG['ANYSCALE_PROJECT'])}"
+        )
 
-                if delay > maximum_update_delay:
-                    raise RuntimeError(
-                        f"Test did not update the results json within "
-                        f"the last {maximum_update_delay} seconds.")
+        msg = f"This will now run test {test_name}."
+        if smoke_test:
+            msg += " This is a smoke test."
+        if is_long_running:
+            msg += " This is a long running test."
+        logger.info(msg)
+
+        logger.info(f"Starting test with timeout {timeout} "
+                    f"(build timeout {build_timeout})")
+        # The test's task (and all tasks it starts) track their blocking
+        # calls in `test_calls`
+        test_calls: Set[Future] = set()
+        token = _test_calls.set(test_calls)
+        try:
+            if not check_progress:
+                task = asyncio.ensure_future(_run())
+            else:
+                task = asyncio.ensure_future(_check_progress())
+        finally:
+            _test_calls.reset(token)
 
-            if time.time() - session_state["start_time"] > timeout:
-                # Long running test reached timeout
-                logger.info(
-                    f"Test command reached timeout after {timeout} seconds")
-                _process_finished_command(
-                    session_controller=session_controller,
-                    scd_id=scd_id,
-                    results=latest_result)
-                should_terminate = True
+        # The timeout time will be updated after the build finished
+        # Build = App config + compute template build and session start
+        timeout_time = time.time() + build_timeout
 
-            elif success:
-                logger.info("All commands finished.")
-                _process_finished_command(
-                    session_controller=session_controller,
-                    scd_id=scd_id,
-                    results=latest_result)
-                should_terminate = True
+        result = {}
+        while not task.done():
+            try:
+                state: State = await asyncio.wait_for(
+                    result_queue.get(), timeout=1)
+            except asyncio.TimeoutError:
+                if time.time() > timeout_time:
+                    stop_event.set()
+                    logger.warning("Test timed out.")
+
+                    if not is_long_running:
+                        logger.warning("Cancelling test in 10 seconds.")
+                        await asyncio.wait({task}, timeout=10)
+                    else:
+                        logger.info("Test is long running. Give 2 minutes to "
+                                    "fetch result and terminate.")
+                        await asyncio.wait({task}, timeout=120)
+
+                    if not task.done():
+                        logger.warning("Cancelling test now.")
+                        task.cancel()
+                    elif is_long_running:
+                        logger.info("Long running results collected.")
+                    break
+                continue
 
-            else:
-                rest_time = timeout - time.time() + session_state["start_time"]
-                logger.info(f"Test command should continue running "
-                            f"for {rest_time} seconds")
-                result_queue.put(
-                    State("END", time.time(), {
-                        "status": "kickoff",
-                        "last_logs": "Test is still running"
-                    }))
+            if not isinstance(state, State):
+                raise RuntimeError(f"Expected `State` object, got {result}")
 
-        except Exception as e:
-            logger.error(e, exc_info=True)
+            if state.state == "CMD_PREPARE":
+                # Reset timeout after build finished
+                timeout_time = state.timestamp + timeout
 
-            logs = str(e)
-            if scd_id is not None:
-                try:
-                    logs = get_command_logs(session_controller, scd_id,
-                                            test_config.get("log_lines", 50))
-                    logs += f"\n{str(e)}"
-                except Exception as e2:
-                    logger.error(e2, exc_info=True)
-
-            result_queue.put(
-                State("END", time.time(), {
-                    "status": "error",
-                    "last_logs": logs
-                }))
-            should_terminate = True
-        finally:
-            if should_terminate:
-                logger.warning("Terminating session")
-                _cleanup_session(sdk, session_id)
+            if state.state == "CMD_RUN":
+                # Reset timeout after prepare command or build finished
+                timeout_time = state.timestamp + timeout
 
-    if not check_progress:
-        process = multiprocessing.Process(target=_run, args=(logger, ))
-    else:
-        process = multiprocessing.Process(
-            target=_check_progress, args=(logger, ))
+            elif state.state == "END":
+                result = state.data
+                break
 
-    build_timeout = test_config["run"].get("build_timeout", 1800)
+        # Let the test clean up (e.g. stop its session) before returning
+        await asyncio.gather(task, return_exceptions=True)
 
-    logger.info(
-        f"Link to project: {anyscale_project_url(project_id=GLOBAL_CONFIG['ANYSCALE_PROJECT'])}"
-    )
+        while not result_queue.empty():
+            state = result_queue.get_nowait()
+            result = state.data
 
-    msg = f"This will now run test {test_name}."
-    if smoke_test:
-        msg += " This is a smoke test."
-    if is_long_running:
-        msg += " This is a long running test."
-    logger.info(msg)
+        logger.info("Final check if everything worked.")
+        result.setdefault("status", "error (status not found)")
 
-    logger.info(f"Starting process with timeout {timeout} "
-                f"(build timeout {build_timeout})")
-    process.start()
+        logger.info(f"Final results: {result}")
 
-    # The timeout time will be updated after the build finished
-    # Build = App config + compute template build and session start
-    timeout_time = time.time() + build_timeout
+        # Blocking calls still running after the test was cancelled (e.g.
+        # a client mode job or artifact transfers) use the temp dir. They
+        # return soon after `stop_event` is set or their timeouts expire.
+        stop_event.set()
+        await self._wait_for_test_calls(test_calls)
+        shutil.rmtree(temp_dir)
 
-    result = {}
-    while process.is_alive():
-        try:
-            state: State = result_queue.get(timeout=1)
-        except (Empty, TimeoutError):
-            if time.time() > timeout_time:
-                stop_event.set()
-                logger.warning("Process timed out.")
-
-                if not is_long_running:
-                    logger.warning("Terminating process in 10 seconds.")
-                    time.sleep(10)
-                    logger.warning("Terminating process now.")
-                    process.terminate()
-                else:
-                    logger.info("Process is long running. Give 2 minutes to "
-                                "fetch result and terminate.")
-                    start_terminate = time.time()
-                    while time.time(
-                    ) < start_terminate + 120 and process.is_alive():
-                        time.sleep(1)
-                    if process.is_alive():
-                        logger.warning("Terminating forcefully now.")
-                        process.terminate()
-                    else:
-                        logger.info("Long running results collected.")
-                break
-            continue
+        return result
 
-        if not isinstance(state, State):
-            raise RuntimeError(f"Expected `State` object, got {result}")
 
-        if state.state == "CMD_PREPARE":
-            # Reset timeout after build finished
-            timeout_time = state.timestamp + timeout
+def run_test_config(
+        local_dir: str,
+        project_id: str,
+        test_name: str,
+        test_config: Dict[Any, Any],
+        smoke_test: bool = False,
+        no_terminate: bool = False,
+        kick_off_only: bool = False,
+        check_progress: bool = False,
+        upload_artifacts: bool = True,
+) -> Dict[Any, Any]:
+    """
 
-        if state.state == "CMD_RUN":
-            # Reset timeout after prepare command or build finished
-            timeout_time = state.timestamp + timeout
+    Returns:
+        Dict with the following entries:
+            status (str): One of [finished, error, timeout]
+            command_link (str): Link to command (Anyscale web UI)
+            last_logs (str): Last logs (excerpt) to send to owner
+            artifacts (dict): Dict of artifacts
+                Key: Name
+                Value: S3 URL
+    """
+    runner = AsyncRunner(max_concurrent_tests=1)
+    try:
+        return asyncio.run(
+            runner.run_test_config(
+                local_dir,
+                project_id,
+                test_name,
+                test_config,
+                smoke_test=smoke_test,
+                no_terminate=no_terminate,
+                kick_off_only=kick_off_only,
+                check_progress=check_progress,
+                upload_artifacts=upload_artifacts))
+    finally:
+        runner.close()
+
+
+# Release test files are parsed with the libyaml based loader if available.
+try:
+    _TestYamlLoader = yaml.CFullLoader
+except AttributeError:
+    _TestYamlLoader = yaml.FullLoader
+
+# file hash -> {test name: test config}
+_test_indexes: Dict[str, Dict[str, Dict[Any, Any]]] = {}
+
+
+def _load_test_index(test_config_file: str) -> Dict[str, Dict[Any, Any]]:
+    """Parse a release test yaml into a name -> config index.
+
+    Indexes are cached in memory by file content hash, so each version of
+    a file is only parsed once per process.
+    """
+    with open(test_config_file, "rb") as f:
+        content = f.read()
+    file_hash = hashlib.sha256(content).hexdigest()
 
-        elif state.state == "END":
-            result = state.data
-            break
+    if file_hash in _test_indexes:
+        return _test_indexes[file_hash]
 
-    while not result_queue.empty():
-        state = result_queue.get_nowait()
-        result = state.data
+    test_configs = yaml.load(content, Loader=_TestYamlLoader)
 
-    logger.info("Final check if everything worked.")
-    try:
-        result.setdefault("status", "error (status not found)")
-    except (TimeoutError, Empty):
-        result = {"status": "timeout", "last_logs": "Test timed out."}
+    test_index = {}
+    for test_config in test_configs:
+        name = test_config.pop("name")
+        test_index[name] = test_config
+    _test_indexes[file_hash] = test_index
+    return test_index
 
-    logger.info(f"Final results: {result}")
 
-    shutil.rmtree(temp_dir)
+def get_test_configs(test_config_file: str,
+                     test_names: List[str]) -> Dict[str, Dict[Any, Any]]:
+    """Look up several tests from a release test yaml at once."""
+    test_index = _load_test_index(test_config_file)
 
-    return result
+    missing = [name for name in test_names if name not in test_index]
+    if missing:
+        raise ValueError(
+            f"Tests with names {missing} not found in test config file "
+            f"at `{test_config_file}`.")
 
+    return {name: copy.deepcopy(test_index[name]) for name in test_names}
 
-def run_test(test_config_file: str,
-             test_name: str,
-             project_id: str,
-             category: str = "unspecified",
-             smoke_test: bool = False,
-             no_terminate: bool = False,
-             kick_off_only: bool = False,
-             check_progress=False,
-             report=True):
-    with open(test_config_file, "rt") as f:
-        test_configs = yaml.load(f, Loader=yaml.FullLoader)
 
-    test_config_dict = {}
-    for test_config in test_configs:
-        name = test_config.pop("name")
-        test_config_dict[name] = test_config
+def get_test_config(test_config_file: str,
+                    test_name: str) -> Dict[Any, Any]:
+    test_index = _load_test_index(test_config_file)
 
-    if test_name not in test_config_dict:
+    if test_name not in test_index:
         raise ValueError(
             f"Test with name `{test_name}` not found in test config file "
             f"at `{test_config_file}`.")
 
-    test_config = test_config_dict[test_name]
+    return copy.deepcopy(test_index[test_name])
+
 
-    if smoke_test and "smoke_test" in test_config:
+def _apply_smoke_test(test_config: Dict[Any, Any]) -> Dict[Any, Any]:
+    if "smoke_test" in test_config:
         smoke_test_config = test_config.pop("smoke_test")
         test_config = _deep_update(test_config, smoke_test_config)
+    return test_config
 
+
+def _get_local_dir(test_config_file: str, test_config: Dict[Any, Any]) -> str:
     local_dir = os.path.dirname(test_config_file)
     if "local_dir" in test_config:
         # local_dir is relative to test_config_file
         local_dir = os.path.join(local_dir, test_config["local_dir"])
+    return local_dir
+
+
+def _prepare_test(test_config_file: str,
+                  test_name: str,
+                  smoke_test: bool = False,
+                  kick_off_only: bool = False,
+                  check_progress: bool = False
+                  ) -> Tuple[Dict[Any, Any], str]:
+    test_config = get_test_config(test_config_file, test_name)
+
+    if smoke_test:
+        test_config = _apply_smoke_test(test_config)
+
+    local_dir = _get_local_dir(test_config_file, test_config)
 
     if test_config["run"].get("use_connect"):
         assert not kick_off_only, \
@@ -1571,17 +2871,15 @@ def run_test(test_config_file: str,
                 "Saving artifacts are not yet supported when running with "
                 "Anyscale connect.")
 
-    result = run_test_config(
-        local_dir,
-        project_id,
-        test_name,
-        test_config,
-        smoke_test=smoke_test,
-        no_terminate=no_terminate,
-        kick_off_only=kick_off_only,
-        check_progress=check_progress,
-        upload_artifacts=report)
+    return test_config, local_dir
+
 
+def _handle_test_result(test_config_file: str,
+                        test_name: str,
+                        result: Dict[Any, Any],
+                        category: str = "unspecified",
+                        kick_off_only: bool = False,
+                        report: bool = True):
     status = result.get("status", "invalid")
 
     if kick_off_only:
@@ -1629,13 +2927,305 @@ def run_test(test_config_file: str,
     return
 
 
+def run_test(test_config_file: str,
+             test_name: str,
+             project_id: str,
+             category: str = "unspecified",
+             smoke_test: bool = False,
+             no_terminate: bool = False,
+             kick_off_only: bool = False,
+             check_progress=False,
+             report=True):
+    test_config, local_dir = _prepare_test(test_config_file, test_name,
+                                           smoke_test, kick_off_only,
+                                           check_progress)
+
+    result = run_test_config(
+        local_dir,
+        project_id,
+        test_name,
+        test_config,
+        smoke_test=smoke_test,
+        no_terminate=no_terminate,
+        kick_off_only=kick_off_only,
+        check_progress=check_progress,
+        upload_artifacts=report)
+
+    _handle_test_result(
+        test_config_file,
+        test_name,
+        result,
+        category=category,
+        kick_off_only=kick_off_only,
+        report=report)
+
+
+def _pack_key(test_config: Dict[Any, Any],
+              local_dir: str) -> Optional[Tuple[str, str, str]]:
+    """Return a key shared by tests that can run on the same session.
+
+    Tests with a cluster config, long running tests and tests using
+    Anyscale connect are never packed.
+    """
+    cluster = test_config["cluster"]
+    run = test_config["run"]
+    if cluster.get("cluster_config") or run.get("long_running") or \
+            run.get("use_connect"):
+        return None
+
+    app_config = _load_config(local_dir, cluster.get("app_config"))
+    compute_tpl = _load_config(local_dir, cluster.get("compute_template"))
+    if not app_config or not compute_tpl:
+        return None
+
+    return (os.path.abspath(local_dir), _dict_hash(app_config),
+            _dict_hash(compute_tpl))
+
+
+def run_suite(suite: Dict[str, List[Any]],
+              project_id: str,
+              category: str = "unspecified",
+              no_terminate: bool = False,
+              report: bool = True,
+              max_concurrent_tests: int = MAX_CONCURRENT_TESTS,
+              reuse_sessions: bool = False,
+              pack_tests: bool = False):
+    """Run all tests of a suite concurrently from this process.
+
+    `suite` maps release test files to test names, like the entries of
+    `SUITES` in `.buildkite/build_pipeline.py`. Tests are driven by one
+    `AsyncRunner`, and each result is reported as soon as its test is
+    done. Raises if any test failed.
+
+    With `reuse_sessions`, sessions are pooled and reused by later tests
+    with the same compute template and app config build. This requires
+    `SESSION_RESET_CMD` to clean up the cluster between tests.
+
+    With `pack_tests`, tests sharing local dir, app config and compute
+    template are grouped and run one after another on a single session
+    (see `AsyncRunner.run_test_pack`).
+    """
+    packs: Dict[Any, List[Tuple[str, str, bool, Dict[Any, Any], str]]] = {}
+    # Tests that could not be prepared fail on their own, like any other
+    # test, instead of aborting the suite
+    invalid_tests: List[Tuple[str, str, Dict[Any, Any]]] = []
+    for test_file, test_names in suite.items():
+        test_config_file = os.path.abspath(os.path.expanduser(test_file))
+        for test_name in test_names:
+            smoke_test = getattr(test_name, "smoke_test", False)
+            try:
+                test_config, local_dir = _prepare_test(
+                    test_config_file, str(test_name), smoke_test)
+            except Exception as e:
+                logger.error(f"Could not prepare test {test_name}: {e}")
+                invalid_tests.append((test_config_file, str(test_name), {
+                    "status": "error",
+                    "last_logs": f"Could not prepare test: {e}"
+                }))
+                continue
+            key = None
+            if pack_tests:
+                key = _pack_key(test_config, local_dir)
+            if key is None:
+                key = (test_config_file, str(test_name), smoke_test)
+            packs.setdefault(key, []).append(
+                (test_config_file, str(test_name), smoke_test, test_config,
+                 local_dir))
+
+    if reuse_sessions and not SESSION_RESET_CMD:
+        logger.warning("Not reusing sessions, as no reset command is set "
+                       "(RELEASE_SESSION_RESET_CMD). Without it, tests would "
+                       "inherit the Ray state of the previous test.")
+        reuse_sessions = False
+
+    num_tests = sum(len(pack)
+                    for pack in packs.values()) + len(invalid_tests)
+    logger.info(f"Running {num_tests} tests in {len(packs)} groups with up "
+                f"to {max_concurrent_tests} groups at a time.")
+
+    runner = AsyncRunner(
+        max_concurrent_tests=max_concurrent_tests,
+        session_pool=SessionPool() if reuse_sessions else None)
+    failed = []
+
+    async def _handle(test_config_file, test_name, result):
+        try:
+            await runner.call(
+                _handle_test_result,
+                test_config_file,
+                test_name,
+                result,
+                category=category,
+                report=report)
+        except Exception as e:
+            logger.error(f"Test {test_name} failed: {e}")
+            failed.append(test_name)
+
+    async def _run_pack(pack):
+        if len(pack) == 1:
+            test_config_file, test_name, smoke_test, test_config, \
+                local_dir = pack[0]
+            result = await runner.run_test_config(
+                local_dir,
+                project_id,
+                test_name,
+                test_config,
+                smoke_test=smoke_test,
+                no_terminate=no_terminate,
+                upload_artifacts=report)
+            await _handle(test_config_file, test_name, result)
+            return
+
+        logger.info(f"Packing tests {[test[1] for test in pack]} "
+                    f"onto one session.")
+
+        async def _on_result(i, result):
+            await _handle(pack[i][0], pack[i][1], result)
+
+        await runner.run_test_pack(
+            pack[0][4],
+            project_id,
+            [(test_name, test_config, smoke_test)
+             for _, test_name, smoke_test, test_config, _ in pack],
+            no_terminate=no_terminate,
+            upload_artifacts=report,
+            on_result=_on_result)
+
+    async def _prefetch_resources():
+        # Tests share the project's resources, so index them all once
+        # instead of looking up each test's resources separately
+        sdk = AnyscaleSDK(auth_token=GLOBAL_CONFIG["ANYSCALE_CLI_TOKEN"])
+        for index in (compute_template_index, app_config_index):
+            try:
+                await runner.call(index.prefetch, sdk, project_id)
+            except Exception as e:
+                logger.warning(f"Could not prefetch {index.kind}s: {e}")
+
+    async def _run_all():
+        try:
+            if num_tests > 1:
+                await _prefetch_resources()
+            await asyncio.gather(
+                *(_handle(*invalid_test) for invalid_test in invalid_tests),
+                *(_run_pack(pack) for pack in packs.values()))
+        finally:
+            await runner.drain_session_pool()
+
+    try:
+        asyncio.run(_run_all())
+    finally:
+        runner.close()
+
+    if failed:
+        raise RuntimeError(f"{len(failed)} of {num_tests} tests failed: "
+                           f"{failed}")
+
+
+def _load_pipeline_suites() -> Dict[str, Dict[str, List[Any]]]:
+    """Load the release test suites defined for the Buildkite pipeline."""
+    pipeline_file = os.path.join(
+        os.path.dirname(os.path.abspath(__file__)), ".buildkite",
+        "build_pipeline.py")
+    spec = importlib.util.spec_from_file_location("build_pipeline",
+                                                  pipeline_file)
+    build_pipeline = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(build_pipeline)
+    return build_pipeline.SUITES
+
+
+def prebuild_suite(suite: Dict[str, List[Any]],
+                   project_id: str,
+                   max_workers: int = 16,
+                   filter_file: str = "",
+                   filter_test: str = "") -> Dict[str, Optional[str]]:
+    """Register all app configs and compute templates of a suite.
+
+    `suite` maps release test files to test names, like the entries of
+    `SUITES` in `.buildkite/build_pipeline.py`. Like the pipeline, only
+    tests whose file contains `filter_file` and whose name contains
+    `filter_test` are considered, if given. Every distinct app config
+    and compute template (by `_dict_hash`) is created if it doesn't exist
+    yet, which kicks off all app config builds at once. Test runs then
+    find their builds already finished or in progress.
+
+    Returns a dict mapping app config names to their IDs.
+    """
+    app_configs = {}
+    compute_tpls = {}
+    for test_file, test_names in suite.items():
+        if filter_file and filter_file not in test_file:
+            continue
+        test_names = [
+            test_name for test_name in test_names
+            if not filter_test or filter_test in test_name
+        ]
+        if not test_names:
+            continue
+
+        test_config_file = os.path.abspath(os.path.expanduser(test_file))
+        if not os.path.exists(test_config_file):
+            logger.warning(f"Test config file {test_config_file} not found, "
+                           f"skipping its tests.")
+            continue
+
+        test_configs = get_test_configs(test_config_file,
+                                        [str(name) for name in test_names])
+        for test_name in test_names:
+            test_config = test_configs[str(test_name)]
+            if getattr(test_name, "smoke_test", False):
+                test_config = _apply_smoke_test(test_config)
+
+            local_dir = _get_local_dir(test_config_file, test_config)
+            cluster = test_config["cluster"]
+
+            app_config = _load_config(local_dir, cluster.get("app_config"))
+            if app_config:
+                app_configs[_dict_hash(app_config)] = app_config
+
+            compute_tpl = _load_config(local_dir,
+                                       cluster.get("compute_template"))
+            if compute_tpl:
+                compute_tpls[_dict_hash(compute_tpl)] = compute_tpl
+
+    logger.info(f"Prebuilding {len(app_configs)} distinct app configs and "
+                f"{len(compute_tpls)} distinct compute templates.")
+
+    sdk = AnyscaleSDK(auth_token=GLOBAL_CONFIG["ANYSCALE_CLI_TOKEN"])
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        tpl_futures = [
+            executor.submit(create_or_find_compute_template, sdk, project_id,
+                            compute_tpl)
+            for compute_tpl in compute_tpls.values()
+        ]
+        app_config_futures = [
+            executor.submit(create_or_find_app_config, sdk, project_id,
+                            app_config) for app_config in app_configs.values()
+        ]
+        for future in tpl_futures:
+            future.result()
+
+        app_config_ids = {}
+        for future in app_config_futures:
+            app_config_id, app_config_name = future.result()
+            app_config_ids[app_config_name] = app_config_id
+            logger.info(f"App config {app_config_name} registered "
+                        f"with ID {app_config_id}")
+
+    return app_config_ids
+
+
 if __name__ == "__main__":
     parser = argparse.ArgumentParser()
     parser.add_argument(
-        "--test-config", type=str, required=True, help="Test config file")
+        "--test-config", type=str, required=False, help="Test config file")
     parser.add_argument("--test-name", type=str, help="Test name in config")
     parser.add_argument(
         "--ray-wheels", required=False, type=str, help="URL to ray wheels")
+    parser.add_argument(
+        "--wheel-search-depth",
+        type=int,
+        default=SEARCH_DEPTH,
+        help="Maximum number of commits to search back for ray wheels")
     parser.add_argument(
         "--no-terminate",
         action="store_true",
@@ -1663,8 +3253,53 @@ if __name__ == "__main__":
         help="Category name, e.g. `release-1.3.0` (will be saved in database)")
     parser.add_argument(
         "--smoke-test", action="store_true", help="Finish quickly for testing")
+    parser.add_argument(
+        "--prebuild",
+        type=str,
+        default=None,
+        help="Register the app configs and compute templates of a release "
+        "test suite (e.g. `nightly`), start their builds and exit")
+    parser.add_argument(
+        "--filter-file",
+        type=str,
+        default="",
+        help="With --prebuild, only consider test files containing this "
+        "string")
+    parser.add_argument(
+        "--filter-test",
+        type=str,
+        default="",
+        help="With --prebuild, only consider tests whose name contains this "
+        "string")
+    parser.add_argument(
+        "--suite",
+        type=str,
+        default=None,
+        help="Run all tests of a release test suite (e.g. `nightly`) "
+        "concurrently from this process")
+    parser.add_argument(
+        "--max-concurrent-tests",
+        type=int,
+        default=MAX_CONCURRENT_TESTS,
+        help="Maximum number of tests to run at once with --suite")
+    parser.add_argument(
+        "--reuse-sessions",
+        action="store_true",
+        default=False,
+        help="With --suite, hand sessions of finished tests to later tests "
+        "with the same cluster instead of stopping them. Requires "
+        "RELEASE_SESSION_RESET_CMD to be set")
+    parser.add_argument(
+        "--pack-tests",
+        action="store_true",
+        default=False,
+        help="With --suite, run tests sharing app config, compute template "
+        "and local dir one after another on a single session")
     args, _ = parser.parse_known_args()
 
+    if not args.test_config and not args.prebuild and not args.suite:
+        parser.error("--test-config is required")
+
     maybe_fetch_api_token()
 
     if args.ray_wheels:
@@ -1674,12 +3309,41 @@ if __name__ == "__main__":
             GLOBAL_CONFIG["RAY_REPO"],
             GLOBAL_CONFIG["RAY_BRANCH"],
             GLOBAL_CONFIG["RAY_VERSION"],
+            search_depth=args.wheel_search_depth,
         )
         if not url:
             raise RuntimeError(f"Could not find wheels for "
                                f"Ray {GLOBAL_CONFIG['RAY_VERSION']}, "
                                f"branch {GLOBAL_CONFIG['RAY_BRANCH']}")
 
+    if args.prebuild:
+        suites = _load_pipeline_suites()
+        if args.prebuild not in suites:
+            raise ValueError(f"Unknown suite `{args.prebuild}`. "
+                             f"Available suites are {list(suites)}.")
+        prebuild_suite(
+            suites[args.prebuild],
+            GLOBAL_CONFIG["ANYSCALE_PROJECT"],
+            filter_file=args.filter_file,
+            filter_test=args.filter_test)
+        sys.exit(0)
+
+    if args.suite:
+        suites = _load_pipeline_suites()
+        if args.suite not in suites:
+            raise ValueError(f"Unknown suite `{args.suite}`. "
+                             f"Available suites are {list(suites)}.")
+        run_suite(
+            suites[args.suite],
+            GLOBAL_CONFIG["ANYSCALE_PROJECT"],
+            category=args.category,
+            no_terminate=args.no_terminate,
+            report=not args.no_report,
+            max_concurrent_tests=args.max_concurrent_tests,
+            reuse_sessions=args.reuse_sessions,
+            pack_tests=args.pack_tests)
+        sys.exit(0)
+
     test_config_file = os.path.abspath(os.path.expanduser(args.test_config))
 
     run_test(
@@ -0,0 +1,114 @@
+"""
+Persistent bare mirrors of git repositories.
+
+Finding the latest commits of a branch only needs commit objects, so
+instead of cloning the repository into a fresh temporary directory on
+every run we keep a bare, treeless mirror in the releaser cache dir and
+incrementally fetch the requested branch into it.
+
+Any URL git understands works, including local paths.
+"""
+import fcntl
+import hashlib
+import logging
+import os
+import subprocess
+import sys
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+from cache_files import CACHE_DIR
+
+logger = logging.getLogger(__name__)
+
+MIRROR_DIR = os.path.join(CACHE_DIR, "mirrors")
+
+
+def mirror_path(repo: str, mirror_dir: str = MIRROR_DIR) -> str:
+    name = hashlib.sha256(repo.encode()).hexdigest()[:16]
+    return os.path.join(mirror_dir, f"{name}.git")
+
+
+@contextmanager
+def _locked(path: str):
+    """Serialize mirror updates across processes sharing the cache dir."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(f"{path}.lock", "wt") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def _git(repo_dir: str, *args: str) -> str:
+    return subprocess.check_output(["git", "-C", repo_dir, *args],
+                                   stderr=subprocess.PIPE).decode(
+                                       sys.stdout.encoding or "utf-8")
+
+
+def update_mirror(repo: str, branch: str,
+                  mirror_dir: str = MIRROR_DIR) -> str:
+    """Create or update the mirror of `repo` and return its git dir.
+
+    Only `branch` is fetched. Trees and blobs are filtered out, so the
+    mirror only ever holds commit objects.
+    """
+    path = mirror_path(repo, mirror_dir)
+    with _locked(path):
+        if not os.path.exists(path):
+            logger.info(f"Creating mirror of {repo} in {path}")
+            subprocess.check_output(
+                [
+                    "git",
+                    "clone",
+                    "--bare",
+                    "--filter=tree:0",
+                    "--single-branch",
+                    f"--branch={branch}",
+                    repo,
+                    path,
+                ],
+                stderr=subprocess.PIPE)
+        else:
+            _git(path, "fetch", "--filter=tree:0", "origin",
+                 f"+refs/heads/{branch}:refs/heads/{branch}")
+    return path
+
+
+def get_latest_commits(repo: str, branch: str = "master", count: int = 10,
+                       mirror_dir: str = MIRROR_DIR) -> List[str]:
+    path = update_mirror(repo, branch, mirror_dir)
+    return _git(path, "log", "-n", str(count), "--pretty=format:%H",
+                f"refs/heads/{branch}").split("\n")
+
+
+def read_blobs(repo_dir: str, revs: List[str]) -> Dict[str, Optional[bytes]]:
+    """Read many objects (e.g. ``<commit>:<path>``) in one batch.
+
+    This goes straight to the object database with a single
+    ``git cat-file --batch`` call, so no worktree checkout is needed.
+    Revisions that don't resolve map to None.
+    """
+    proc = subprocess.run(
+        ["git", "-C", repo_dir, "cat-file", "--batch"],
+        input="".join(f"{rev}\n" for rev in revs).encode(),
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        check=True)
+
+    out = proc.stdout
+    blobs = {}
+    pos = 0
+    for rev in revs:
+        header_end = out.index(b"\n", pos)
+        header = out[pos:header_end].split()
+        pos = header_end + 1
+        # Either "<sha> <type> <size>" or "<rev> missing/ambiguous"
+        if len(header) != 3:
+            blobs[rev] = None
+            continue
+        size = int(header[2])
+        blobs[rev] = out[pos:pos + size]
+        pos += size + 1
+    return blobs
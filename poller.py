@@ -0,0 +1,149 @@
+"""
+Shared poller for long running remote operations.
+
+Instead of every waiter running its own ``time.sleep(1)`` loop, pending
+resources (app config builds, session operations, session commands) are
+registered with one `Poller`. A single background thread polls each
+resource with its own exponential backoff and jitter and resolves a
+future once the resource is done. Waiters block on that future.
+"""
+import heapq
+import itertools
+import random
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, List, Optional, Tuple
+
+# A poll function returns (done, result). If done is True, `result`
+# resolves the future. Raising an exception fails the future. Poll functions
+# run one after another on the poller thread, so each must bound its
+# requests with a timeout.
+PollFn = Callable[[], Tuple[bool, Any]]
+
+
+class _PollFuture(Future):
+    """Future whose cancellation is serialized with the poller.
+
+    The poller only resolves futures while holding its lock, so a future
+    can't be cancelled between the poller's ``done()`` check and setting
+    its result.
+    """
+
+    def __init__(self, cond: threading.Condition):
+        super().__init__()
+        self._poller_cond = cond
+
+    def cancel(self) -> bool:
+        with self._poller_cond:
+            return super().cancel()
+
+
+class _PollEntry:
+    def __init__(self, poll_fn: PollFn, future: Future, interval: float,
+                 max_interval: float):
+        self.poll_fn = poll_fn
+        self.future = future
+        self.interval = interval
+        self.max_interval = max_interval
+
+
+class Poller:
+    def __init__(self,
+                 initial_interval: float = 1.0,
+                 max_interval: float = 30.0,
+                 backoff: float = 1.5,
+                 jitter: float = 0.2):
+        self.initial_interval = initial_interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+        self.jitter = jitter
+
+        self._queue: List[Tuple[float, int, _PollEntry]] = []
+        self._counter = itertools.count()
+        self._cond = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+
+    def submit(self,
+               poll_fn: PollFn,
+               initial_interval: Optional[float] = None,
+               max_interval: Optional[float] = None) -> Future:
+        """Poll `poll_fn` until it is done and return a future for it.
+
+        The first poll happens right away. Cancelling the future stops
+        polling.
+        """
+        future = _PollFuture(self._cond)
+        entry = _PollEntry(
+            poll_fn=poll_fn,
+            future=future,
+            interval=initial_interval or self.initial_interval,
+            max_interval=max_interval or self.max_interval)
+        with self._cond:
+            self._push(time.monotonic(), entry)
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._loop, name="poller", daemon=True)
+                self._thread.start()
+            self._cond.notify()
+        return future
+
+    def _push(self, when: float, entry: _PollEntry):
+        heapq.heappush(self._queue, (when, next(self._counter), entry))
+
+    def _next_delay(self, entry: _PollEntry) -> float:
+        delay = entry.interval * random.uniform(1 - self.jitter,
+                                                1 + self.jitter)
+        entry.interval = min(entry.interval * self.backoff,
+                             entry.max_interval)
+        return delay
+
+    def _loop(self):
+        while True:
+            with self._cond:
+                while not self._queue:
+                    self._cond.wait()
+                when, _, entry = self._queue[0]
+                now = time.monotonic()
+                if when > now:
+                    self._cond.wait(timeout=when - now)
+                    continue
+                heapq.heappop(self._queue)
+
+            if entry.future.cancelled():
+                continue
+
+            try:
+                done, result = entry.poll_fn()
+            except Exception as e:
+                with self._cond:
+                    if not entry.future.done():
+                        entry.future.set_exception(e)
+                continue
+
+            with self._cond:
+                # The future may have been cancelled while polling
+                if entry.future.done():
+                    continue
+                if done:
+                    entry.future.set_result(result)
+                else:
+                    self._push(time.monotonic() + self._next_delay(entry),
+                               entry)
+
+
+_poller: Optional[Poller] = None
+_poller_lock = threading.Lock()
+
+
+def get_poller() -> Poller:
+    """Return the poller shared by all tests of this process.
+
+    Tests are driven from one process (see `e2e.AsyncRunner`), so all
+    their builds, sessions and commands are polled by a single thread.
+    """
+    global _poller
+    with _poller_lock:
+        if _poller is None:
+            _poller = Poller()
+        return _poller
@@ -0,0 +1,236 @@
+"""
+Multiplexed SSH connections to Anyscale session head nodes.
+
+The session controller opens a new SSH connection (and does a new key
+exchange) for every single push or pull. A `SessionConnection` instead
+starts one OpenSSH control master per session and sends every later
+transfer through its socket, so a transfer only costs a new channel on
+the open connection.
+
+Several small remote files (e.g. result files and artifacts) can be
+fetched together with `pull_many`, which streams them as one archive.
+"""
+import logging
+import os
+import shlex
+import shutil
+import subprocess
+import tarfile
+import tempfile
+import threading
+from typing import Callable, Dict, List, Optional
+
+from cache_files import atomic_write
+
+logger = logging.getLogger(__name__)
+
+SSH_USER = os.environ.get("RELEASE_SESSION_SSH_USER", "ubuntu")
+
+# Seconds the control master stays up without any transfers. This bounds
+# the lifetime of masters that are not closed explicitly.
+CONTROL_PERSIST_S = int(
+    os.environ.get("RELEASE_SSH_CONTROL_PERSIST", "600"))
+
+# Seconds to wait for the connection to the head node.
+CONNECT_TIMEOUT_S = 30
+
+# Seconds after which a remote command or transfer is killed.
+TRANSFER_TIMEOUT_S = int(
+    os.environ.get("RELEASE_SSH_TRANSFER_TIMEOUT", "1800"))
+
+
+class SessionConnection:
+    """One multiplexed SSH connection to a session's head node.
+
+    Relative remote paths are relative to the remote user's home dir.
+    Call `close` to stop the control master and remove the key file.
+    """
+
+    def __init__(self, host: str, private_key: str, user: str = SSH_USER):
+        self.host = host
+        self.user = user
+        self._dir = tempfile.mkdtemp(prefix="session-ssh-")
+        self.key_file = os.path.join(self._dir, "key")
+        fd = os.open(self.key_file, os.O_WRONLY | os.O_CREAT, 0o600)
+        with os.fdopen(fd, "wt") as f:
+            f.write(private_key)
+        self.control_path = os.path.join(self._dir, "control")
+
+    @property
+    def target(self) -> str:
+        return f"{self.user}@{self.host}"
+
+    def ssh_command(self) -> List[str]:
+        return [
+            "ssh",
+            "-i", self.key_file,
+            "-o", "IdentitiesOnly=yes",
+            "-o", "StrictHostKeyChecking=no",
+            "-o", "UserKnownHostsFile=/dev/null",
+            "-o", "LogLevel=ERROR",
+            "-o", f"ConnectTimeout={CONNECT_TIMEOUT_S}",
+            "-o", "ControlMaster=auto",
+            "-o", f"ControlPath={self.control_path}",
+            "-o", f"ControlPersist={CONTROL_PERSIST_S}",
+        ]  # yapf: disable
+
+    def _remote_args(self, command: str) -> List[str]:
+        return self.ssh_command() + [self.target, command]
+
+    def connect(self):
+        """Start the control master in the background."""
+        subprocess.run(
+            self.ssh_command() + ["-N", "-f", self.target],
+            check=True,
+            stdin=subprocess.DEVNULL,
+            stderr=subprocess.PIPE,
+            timeout=TRANSFER_TIMEOUT_S)
+
+    def run(self, command: str) -> bytes:
+        """Run a shell command on the head node and return its stdout."""
+        return subprocess.run(
+            self._remote_args(command),
+            check=True,
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            timeout=TRANSFER_TIMEOUT_S).stdout
+
+    def push(self, source: str, target: str):
+        target_dir = os.path.dirname(target)
+        command = f"cat > {shlex.quote(target)}"
+        if target_dir:
+            command = f"mkdir -p {shlex.quote(target_dir)} && {command}"
+        with open(source, "rb") as f:
+            subprocess.run(
+                self._remote_args(command),
+                check=True,
+                stdin=f,
+                stderr=subprocess.PIPE,
+                timeout=TRANSFER_TIMEOUT_S)
+
+    def pull(self, source: str, target: str):
+        # Only replace the target once the whole file arrived, so a missing
+        # remote file doesn't leave an empty local file behind
+        with atomic_write(target, "wb") as f:
+            subprocess.run(
+                self._remote_args(f"cat {shlex.quote(source)}"),
+                check=True,
+                stdin=subprocess.DEVNULL,
+                stdout=f,
+                stderr=subprocess.PIPE,
+                timeout=TRANSFER_TIMEOUT_S)
+
+    def pull_many(self,
+                  sources: Dict[str, str],
+                  target_dir: str,
+                  on_file: Optional[Callable[[str, str], None]] = None
+                  ) -> Dict[str, str]:
+        """Pull several remote files or dirs in one archive transfer.
+
+        `sources` maps names to remote paths. A file is stored as
+        ``target_dir/<name>``, and a dir is stored recursively under it.
+        Returns a map of name -> local path for all sources that existed
+        on the head node. `on_file` is called for each pulled file as soon
+        as it is stored, while the rest of the archive is still streaming.
+        Files within a dir are passed as ``<name>/<relative path>``.
+        """
+        names_by_path: Dict[str, List[str]] = {}
+        for name, remote_path in sources.items():
+            names_by_path.setdefault(os.path.normpath(remote_path),
+                                     []).append(name)
+        if not names_by_path:
+            return {}
+
+        command = "tar -czPf - --ignore-failed-read " + " ".join(
+            shlex.quote(path) for path in names_by_path)
+        pulled = {}
+        proc = subprocess.Popen(
+            self._remote_args(command),
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE)
+        # Reading the archive blocks, so a timer kills a stuck transfer
+        timer = threading.Timer(TRANSFER_TIMEOUT_S, proc.kill)
+        timer.start()
+        try:
+            with tarfile.open(fileobj=proc.stdout, mode="r|gz") as tar:
+                for member in tar:
+                    if member.isfile():
+                        self._store_member(tar, member, names_by_path,
+                                           target_dir, pulled, on_file)
+        finally:
+            _, stderr = proc.communicate()
+            timer.cancel()
+        if proc.returncode != 0:
+            raise subprocess.CalledProcessError(
+                proc.returncode, command, stderr=stderr)
+        return pulled
+
+    @staticmethod
+    def _store_member(tar: tarfile.TarFile, member: tarfile.TarInfo,
+                      names_by_path: Dict[str, List[str]], target_dir: str,
+                      pulled: Dict[str, str],
+                      on_file: Optional[Callable[[str, str], None]]):
+        # (file name, local path) of all sources this member belongs to
+        targets = []
+        for path, names in names_by_path.items():
+            if member.name == path:
+                targets += [(name, os.path.join(target_dir, name))
+                            for name in names]
+            elif member.name.startswith(path.rstrip("/") + "/"):
+                rel_path = member.name[len(path.rstrip("/")) + 1:]
+                if ".." in rel_path.split("/"):
+                    continue
+                targets += [(f"{name}/{rel_path}",
+                             os.path.join(target_dir, name, rel_path))
+                            for name in names]
+            else:
+                continue
+            for name in names:
+                pulled[name] = os.path.join(target_dir, name)
+        if not targets:
+            return
+
+        first_path = targets[0][1]
+        os.makedirs(os.path.dirname(first_path), exist_ok=True)
+        with open(first_path, "wb") as f:
+            shutil.copyfileobj(tar.extractfile(member), f, 1 << 20)
+        for file_name, local_path in targets:
+            if local_path != first_path:
+                os.makedirs(os.path.dirname(local_path), exist_ok=True)
+                shutil.copyfile(first_path, local_path)
+            if on_file:
+                on_file(file_name, local_path)
+
+    def close(self):
+        try:
+            subprocess.run(
+                self.ssh_command() + ["-O", "exit", self.target],
+                stdin=subprocess.DEVNULL,
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
+                timeout=CONNECT_TIMEOUT_S)
+        except (OSError, subprocess.SubprocessError) as e:
+            logger.warning(f"Could not stop SSH connection to {self.host}: "
+                           f"{e}")
+        shutil.rmtree(self._dir, ignore_errors=True)
+
+
+def open_session_connection(api_client, session_id: str) -> SessionConnection:
+    """Look up the head node of a session and connect to it.
+
+    `api_client` is the internal Anyscale API client of the session
+    controller.
+    """
+    head_ip = api_client.get_session_head_ip_api_v2_sessions_session_id_head_ip_get(
+        session_id).result.head_ip
+    ssh_key = api_client.get_session_ssh_key_api_v2_sessions_session_id_ssh_key_get(
+        session_id).result
+    connection = SessionConnection(head_ip, ssh_key.private_key)
+    try:
+        connection.connect()
+    except Exception:
+        connection.close()
+        raise
+    return connection
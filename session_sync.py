@@ -0,0 +1,177 @@
+"""
+Incremental file sync to Anyscale sessions.
+
+Instead of rsyncing the whole local dir of a test to its session and
+then pushing the test state file separately, we
+
+1. hash the local tree, re-using the hashes of files whose size and
+   mtime didn't change,
+2. compare the hashes against the manifest of files already sent to the
+   session, and
+3. pack only the changed files, together with extra files like the test
+   state file, into a single archive. It is pushed and unpacked with one
+   session command.
+
+Manifests are kept per session under the releaser cache dir, so a
+session that runs several tests (pooled sessions, packed tests) only
+receives what changed in between. A manifest only records what was sent,
+so the archive also lists the hashes of the files it skips, and the
+unpack command checks them on the session. If a test changed or deleted
+any of them, the unpack command fails and the caller sends all files.
+"""
+import hashlib
+import io
+import json
+import logging
+import os
+import shlex
+import tarfile
+from typing import Dict, List, Optional
+
+from cache_files import CACHE_DIR, file_hash, write_json
+
+logger = logging.getLogger(__name__)
+
+SYNC_DIR = os.path.join(CACHE_DIR, "session_sync")
+
+# Directories that are never synced
+IGNORE_DIRS = {".git", "__pycache__"}
+
+# Archive member dir for extra files, moved to their targets on unpack
+EXTRA_DIR = ".release_sync_extra"
+
+# Archive member with the hashes of files expected on the session
+CHECK_FILE = ".release_sync_check"
+
+
+def _cache_file(kind: str, key: str, sync_dir: str = SYNC_DIR) -> str:
+    return os.path.join(sync_dir, kind,
+                        hashlib.sha256(key.encode()).hexdigest() + ".json")
+
+
+def _load_json(path: str) -> Dict:
+    try:
+        with open(path, "rt") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _store_json(path: str, data: Dict):
+    try:
+        write_json(path, data)
+    except OSError as e:
+        logger.warning(f"Could not write sync cache file {path}: {e}")
+
+
+def hash_tree(local_dir: str, ignore_files: List[str] = ()) -> Dict[str, str]:
+    """Return a map of relative path -> content hash for `local_dir`.
+
+    Hashes are cached on disk by (size, mtime), so only new or modified
+    files are read. `ignore_files` are relative paths to leave out.
+    """
+    local_dir = os.path.abspath(local_dir)
+    cache_file = _cache_file("hashes", local_dir)
+    cached = _load_json(cache_file)
+
+    hashes = {}
+    stats = {}
+    for dirpath, dirnames, filenames in os.walk(local_dir):
+        dirnames[:] = [d for d in dirnames if d not in IGNORE_DIRS]
+        for filename in filenames:
+            path = os.path.join(dirpath, filename)
+            rel_path = os.path.relpath(path, local_dir)
+            if rel_path in ignore_files:
+                continue
+            try:
+                stat = os.stat(path)
+                entry = cached.get(rel_path)
+                if entry and entry[0] == stat.st_size and \
+                        entry[1] == stat.st_mtime_ns:
+                    digest = entry[2]
+                else:
+                    digest = file_hash(path)
+            except OSError:
+                continue
+            hashes[rel_path] = digest
+            stats[rel_path] = [stat.st_size, stat.st_mtime_ns, digest]
+
+    _store_json(cache_file, stats)
+    return hashes
+
+
+class SessionManifest:
+    """Relative path -> content hash of the files sent to a session."""
+
+    def __init__(self, session_id: str, sync_dir: str = SYNC_DIR):
+        self.path = _cache_file("sessions", session_id, sync_dir)
+
+    def load(self) -> Dict[str, str]:
+        return _load_json(self.path)
+
+    def save(self, files: Dict[str, str]):
+        _store_json(self.path, files)
+
+
+def _checkable(path: str) -> bool:
+    # Names sha256sum would escape are simply sent again instead
+    return "\\" not in path and "\n" not in path
+
+
+def changed_files(local_files: Dict[str, str],
+                  remote_files: Dict[str, str]) -> List[str]:
+    return sorted(
+        path for path, digest in local_files.items()
+        if remote_files.get(path) != digest or not _checkable(path))
+
+
+def build_archive(local_dir: str,
+                  files: List[str],
+                  extra_files: Dict[str, str],
+                  archive_path: str,
+                  expected_files: Optional[Dict[str, str]] = None):
+    """Pack `files` and `extra_files` into a gzipped tar archive.
+
+    `files` are paths relative to `local_dir` and keep their relative
+    path in the archive. `extra_files` maps remote target paths to local
+    files. They are stored under `EXTRA_DIR` and moved into place by
+    `unpack_command`. `expected_files` maps relative paths to the hashes
+    the unchanged files must have on the session. They are stored as
+    `CHECK_FILE` and checked by `unpack_command`.
+    """
+    with tarfile.open(archive_path, "w:gz", compresslevel=1) as tar:
+        for path in files:
+            tar.add(
+                os.path.join(local_dir, path), arcname=path, recursive=False)
+        for i, local_path in enumerate(extra_files.values()):
+            tar.add(local_path, arcname=f"{EXTRA_DIR}/{i}", recursive=False)
+        if expected_files:
+            data = "".join(
+                f"{digest}  {path}\n"
+                for path, digest in sorted(expected_files.items())).encode()
+            info = tarfile.TarInfo(CHECK_FILE)
+            info.size = len(data)
+            tar.addfile(info, io.BytesIO(data))
+
+
+def unpack_command(remote_archive: str,
+                   extra_files: Dict[str, str],
+                   check: bool = False) -> str:
+    """Shell command unpacking an archive from `build_archive`.
+
+    The command must run in the session's working dir. With `check`, it
+    fails if any of the expected files of the archive changed.
+    """
+    cmds = [f"tar -xzf {shlex.quote(remote_archive)}"]
+    for i, target in enumerate(extra_files):
+        target_dir = os.path.dirname(target)
+        if target_dir:
+            cmds.append(f"mkdir -p {shlex.quote(target_dir)}")
+        cmds.append(f"mv {EXTRA_DIR}/{i} {shlex.quote(target)}")
+    if extra_files:
+        cmds.append(f"rmdir {EXTRA_DIR}")
+    cmds.append(f"rm -f {shlex.quote(remote_archive)}")
+    if check:
+        cmds.append(f"{{ sha256sum --status -c {CHECK_FILE} 2>/dev/null; "
+                    f"ok=$?; rm -f {CHECK_FILE}; [ $ok -eq 0 ]; }}")
+    return " && ".join(cmds)
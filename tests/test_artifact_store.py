@@ -0,0 +1,65 @@
+import hashlib
+import json
+import os
+
+from artifact_store import ArtifactUploader, BlobStore, LocalArtifactStore
+
+
+def _write(path, data):
+    with open(path, "wb") as f:
+        f.write(data)
+    return str(path)
+
+
+def test_local_store_round_trip(tmp_path):
+    store = LocalArtifactStore(str(tmp_path / "store"))
+    local_file = _write(tmp_path / "log.txt", b"hello")
+
+    assert not store.exists("a/b/log.txt")
+    url = store.upload(local_file, "a/b/log.txt")
+    assert url == store.url("a/b/log.txt")
+    assert store.exists("a/b/log.txt")
+    with open(url, "rb") as f:
+        assert f.read() == b"hello"
+    # No temp files are left behind
+    assert os.listdir(os.path.dirname(url)) == ["log.txt"]
+
+
+def test_blob_store(tmp_path):
+    store = LocalArtifactStore(str(tmp_path / "store"))
+    blob_store = BlobStore(store, "blobs")
+    first = _write(tmp_path / "first", b"same")
+    second = _write(tmp_path / "second", b"same")
+
+    entry = blob_store.put(first)
+    digest = hashlib.sha256(b"same").hexdigest()
+    assert entry == {
+        "sha256": digest,
+        "size": 4,
+        "url": store.url(f"blobs/{digest}"),
+    }
+    assert blob_store.put(second) == entry
+    assert os.listdir(os.path.join(store.root, "blobs")) == [digest]
+
+    url = blob_store.put_manifest({"first": entry}, "runs/1/manifest.json")
+    with open(url, "rt") as f:
+        assert json.load(f) == {"first": entry}
+
+
+def test_uploader(tmp_path):
+    store = LocalArtifactStore(str(tmp_path / "store"))
+    files = {
+        f"file{i}": _write(tmp_path / f"file{i}", str(i % 3).encode())
+        for i in range(10)
+    }
+
+    with ArtifactUploader(BlobStore(store, "blobs"), max_workers=4) as up:
+        for name, local_file in files.items():
+            up.submit(name, local_file)
+        blobs = up.wait()
+
+    assert sorted(blobs) == sorted(files)
+    for name, entry in blobs.items():
+        with open(entry["url"], "rb") as f, open(files[name], "rb") as g:
+            assert f.read() == g.read()
+    assert len(os.listdir(os.path.join(store.root, "blobs"))) == 3
@@ -0,0 +1,32 @@
+import os
+
+import pytest
+
+from cache_files import atomic_write, copy_file, file_hash, write_json
+
+
+def test_atomic_write(tmp_path):
+    path = str(tmp_path / "a" / "b.json")
+    write_json(path, {"x": 1})
+    with open(path, "rt") as f:
+        assert f.read() == '{"x": 1}'
+
+    copy_file(path, str(tmp_path / "copy.json"))
+    assert file_hash(str(tmp_path / "copy.json")) == file_hash(path)
+
+
+def test_atomic_write_failure(tmp_path):
+    path = str(tmp_path / "b.json")
+    write_json(path, {"x": 1})
+
+    with pytest.raises(RuntimeError):
+        with atomic_write(path) as f:
+            f.write("partial")
+            raise RuntimeError
+    with pytest.raises(TypeError):
+        write_json(path, {"x": object()})
+
+    # The target is untouched and no temp files are left behind
+    assert os.listdir(str(tmp_path)) == ["b.json"]
+    with open(path, "rt") as f:
+        assert f.read() == '{"x": 1}'
@@ -0,0 +1,68 @@
+import os
+import subprocess
+
+import pytest
+
+from git_mirror import get_latest_commits, mirror_path, read_blobs
+
+
+def _git(repo_dir, *args):
+    return subprocess.check_output(
+        ["git", "-C", repo_dir, *args]).decode().strip()
+
+
+def _commit(work_dir, message, files):
+    for name, content in files.items():
+        with open(os.path.join(work_dir, name), "wt") as f:
+            f.write(content)
+    _git(work_dir, "add", "-A")
+    _git(work_dir, "-c", "user.name=Test", "-c", "user.email=test@example.com",
+         "commit", "-q", "-m", message)
+    _git(work_dir, "push", "-q", "origin", "HEAD:master")
+    return _git(work_dir, "rev-parse", "HEAD")
+
+
+@pytest.fixture
+def repo(tmp_path):
+    """A local bare repo and a work tree pushing to it."""
+    bare = str(tmp_path / "repo.git")
+    work_dir = str(tmp_path / "work")
+    subprocess.check_call(["git", "init", "-q", "--bare", bare])
+    subprocess.check_call(["git", "init", "-q", work_dir])
+    _git(work_dir, "remote", "add", "origin", bare)
+    _git(work_dir, "checkout", "-q", "-b", "master")
+    return bare, work_dir
+
+
+def test_get_latest_commits(repo, tmp_path):
+    bare, work_dir = repo
+    mirror_dir = str(tmp_path / "mirrors")
+    commits = [_commit(work_dir, f"c{i}", {"a.txt": str(i)}) for i in range(3)]
+
+    assert get_latest_commits(bare, "master", 2, mirror_dir) == [
+        commits[2], commits[1]
+    ]
+    assert os.path.isdir(mirror_path(bare, mirror_dir))
+
+    # The existing mirror is updated
+    commits.append(_commit(work_dir, "c3", {"a.txt": "3"}))
+    assert get_latest_commits(bare, "master", 10, mirror_dir) == \
+        commits[::-1]
+
+
+def test_read_blobs(repo):
+    bare, work_dir = repo
+    first = _commit(work_dir, "first", {"a.txt": "one\n", "b.bin": "\0\n\n"})
+    second = _commit(work_dir, "second", {"a.txt": "two\n"})
+
+    assert read_blobs(bare, [
+        f"{first}:a.txt",
+        f"{second}:a.txt",
+        f"{second}:missing.txt",
+        f"{first}:b.bin",
+    ]) == {
+        f"{first}:a.txt": b"one\n",
+        f"{second}:a.txt": b"two\n",
+        f"{second}:missing.txt": None,
+        f"{first}:b.bin": b"\0\n\n",
+    }
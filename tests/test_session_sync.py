@@ -0,0 +1,87 @@
+import os
+import subprocess
+
+import pytest
+
+from session_sync import (build_archive, changed_files, file_hash,
+                          unpack_command)
+
+
+def _write(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wt") as f:
+        f.write(data)
+
+
+def _read(path):
+    with open(path, "rt") as f:
+        return f.read()
+
+
+@pytest.fixture
+def dirs(tmp_path):
+    """A local test dir with its state file, and the session's dir."""
+    local_dir = str(tmp_path / "local")
+    remote_dir = str(tmp_path / "remote")
+    _write(os.path.join(local_dir, "workload.py"), "print('hi')\n")
+    _write(os.path.join(local_dir, "configs", "app.yaml"), "a: 1\n")
+    _write(str(tmp_path / "state.json"), "{}")
+    os.makedirs(remote_dir)
+    return local_dir, remote_dir, str(tmp_path / "state.json")
+
+
+def _sync(local_dir, remote_dir, files, extra_files, expected_files=None):
+    archive = os.path.join(remote_dir, "sync.tar.gz")
+    build_archive(local_dir, files, extra_files, archive, expected_files)
+    return subprocess.run(
+        [
+            "bash", "-c",
+            unpack_command("sync.tar.gz", extra_files,
+                           check=expected_files is not None)
+        ],
+        cwd=remote_dir)
+
+
+def test_unpack(dirs):
+    local_dir, remote_dir, state_file = dirs
+    extra_files = {os.path.join(remote_dir, "state", "s.json"): state_file}
+
+    proc = _sync(local_dir, remote_dir, ["workload.py", "configs/app.yaml"],
+                 extra_files)
+    assert proc.returncode == 0
+    assert _read(os.path.join(remote_dir, "workload.py")) == "print('hi')\n"
+    assert _read(os.path.join(remote_dir, "configs", "app.yaml")) == "a: 1\n"
+    assert _read(os.path.join(remote_dir, "state", "s.json")) == "{}"
+    assert sorted(os.listdir(remote_dir)) == [
+        "configs", "state", "workload.py"
+    ]
+
+
+def test_unpack_checks_unchanged_files(dirs):
+    local_dir, remote_dir, _ = dirs
+    hashes = {
+        path: file_hash(os.path.join(local_dir, path))
+        for path in ["workload.py", "configs/app.yaml"]
+    }
+    assert _sync(local_dir, remote_dir, sorted(hashes), {}).returncode == 0
+
+    # Only the changed file is sent, the other one is checked
+    _write(os.path.join(local_dir, "workload.py"), "print('bye')\n")
+    local_hashes = dict(hashes)
+    local_hashes["workload.py"] = file_hash(
+        os.path.join(local_dir, "workload.py"))
+    files = changed_files(local_hashes, hashes)
+    assert files == ["workload.py"]
+    expected = {"configs/app.yaml": hashes["configs/app.yaml"]}
+    assert _sync(local_dir, remote_dir, files, {}, expected).returncode == 0
+    assert _read(os.path.join(remote_dir, "workload.py")) == "print('bye')\n"
+    assert not os.path.exists(os.path.join(remote_dir, ".release_sync_check"))
+
+    # A file changed on the session fails the check
+    _write(os.path.join(remote_dir, "configs", "app.yaml"), "a: 2\n")
+    assert _sync(local_dir, remote_dir, files, {}, expected).returncode != 0
+    assert not os.path.exists(os.path.join(remote_dir, ".release_sync_check"))
+
+    # So does a deleted one
+    os.remove(os.path.join(remote_dir, "configs", "app.yaml"))
+    assert _sync(local_dir, remote_dir, files, {}, expected).returncode != 0
@@ -0,0 +1,96 @@
+import os
+import time
+
+import pytest
+
+from wheel_index import LocalWheelStorage, WheelIndex, wheel_key
+
+
+def _add_wheel(root, commit, version, branch="master"):
+    path = os.path.join(root, wheel_key(branch, commit, version))
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    open(path, "wb").close()
+    return path
+
+
+@pytest.fixture
+def storage(tmp_path):
+    return LocalWheelStorage(str(tmp_path / "wheels"))
+
+
+@pytest.fixture
+def cache_dir(tmp_path):
+    return str(tmp_path / "cache")
+
+
+CANDIDATES = [("c4", "2.0.0"), ("c3", "2.0.0"), ("c2", "2.0.0"),
+              ("c1", "1.9.0")]
+
+
+def test_refresh_lists_wheels(storage, cache_dir):
+    _add_wheel(storage.root, "c1", "1.9.0")
+    _add_wheel(storage.root, "c2", "2.0.0")
+    _add_wheel(storage.root, "c3", "2.0.0", branch="releases/2.0.0")
+    os.makedirs(os.path.join(storage.root, "master", "c2", "junk"))
+    open(os.path.join(storage.root, "master", "c2", "README"), "w").close()
+
+    wheels = WheelIndex(storage, "master", cache_dir=cache_dir).refresh()
+    assert wheels == {
+        "c1": {
+            "1.9.0": wheel_key("master", "c1", "1.9.0")
+        },
+        "c2": {
+            "2.0.0": wheel_key("master", "c2", "2.0.0")
+        },
+    }
+
+
+def test_index_is_cached(storage, cache_dir):
+    _add_wheel(storage.root, "c2", "2.0.0")
+    index = WheelIndex(storage, "master", cache_dir=cache_dir)
+    assert index.latest(CANDIDATES) == ("c2", "2.0.0")
+    assert os.path.exists(index.cache_file)
+
+    # A new index for the same branch uses the cached listing
+    _add_wheel(storage.root, "c1", "1.9.0")
+    index = WheelIndex(storage, "master", cache_dir=cache_dir)
+    assert "c1" not in index.wheels
+
+
+def test_latest(storage, cache_dir):
+    path = _add_wheel(storage.root, "c2", "2.0.0")
+    index = WheelIndex(storage, "master", cache_dir=cache_dir)
+    assert index.latest(CANDIDATES) == ("c2", "2.0.0")
+    assert index.url("c2", "2.0.0") == path
+    # The ray version must match as well
+    assert index.latest([("c2", "2.1.0"), ("c1", "1.9.0")]) is None
+    assert index.latest([]) is None
+
+
+def test_latest_probes_newer_commits(storage, cache_dir, monkeypatch):
+    _add_wheel(storage.root, "c2", "2.0.0")
+    index = WheelIndex(storage, "master", cache_dir=cache_dir)
+    assert index.latest(CANDIDATES) == ("c2", "2.0.0")
+
+    # A recent index answers without touching the storage
+    path = _add_wheel(storage.root, "c3", "2.0.0")
+    assert index.latest(CANDIDATES) == ("c2", "2.0.0")
+
+    def list_keys(prefix):
+        raise AssertionError("The index should not be rebuilt")
+
+    monkeypatch.setattr(storage, "list_keys", list_keys)
+    index._built_at = time.time() - 3600
+    assert index.latest(CANDIDATES) == ("c3", "2.0.0")
+    assert index.url("c3", "2.0.0") == path
+    # Older commits are still answered by the index
+    assert index.latest(CANDIDATES[2:]) == ("c2", "2.0.0")
+
+
+def test_latest_probes_without_match(storage, cache_dir):
+    index = WheelIndex(storage, "master", cache_dir=cache_dir)
+    assert index.latest(CANDIDATES) is None
+
+    _add_wheel(storage.root, "c1", "1.9.0")
+    index._built_at = time.time() - 3600
+    assert index.latest(CANDIDATES) == ("c1", "1.9.0")
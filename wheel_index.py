@@ -0,0 +1,285 @@
+"""
+Index of all Ray wheels built for a branch.
+
+Instead of sending one HEAD request per candidate commit, we list the
+``<branch>/`` prefix of the wheels bucket once and build a
+commit -> {ray_version: key} map. The map is cached on disk, so a fan-out
+of many release test steps shares a single listing. "Latest commit with a
+wheel" is then answered by intersecting the map with git history. Only
+the few commits newer than the newest indexed wheel are probed directly,
+as their wheels may have been uploaded after the listing.
+
+The storage backend is pluggable. `S3WheelStorage` lists the public
+ray-wheels bucket, and `LocalWheelStorage` reads the same layout from a
+local directory (set ``RELEASER_WHEEL_DIR`` to use it).
+"""
+import fcntl
+import hashlib
+import json
+import logging
+import os
+import re
+import time
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import boto3
+from botocore import UNSIGNED
+from botocore.config import Config
+from botocore.exceptions import BotoCoreError, ClientError
+
+from cache_files import CACHE_DIR, write_json
+from wheels import (WheelCache, find_latest_wheel, find_latest_wheel_deep,
+                    wheel_url)
+
+logger = logging.getLogger(__name__)
+
+# Seconds a cached listing is used before the bucket is listed again.
+INDEX_MAX_AGE_S = int(os.environ.get("RELEASER_WHEEL_INDEX_MAX_AGE", "600"))
+
+# Seconds a listing is trusted to hold all wheels. If an older listing
+# has no wheel for the newest candidate commits, up to INDEX_PROBE_DEPTH
+# of the commits newer than its newest wheel are probed directly.
+INDEX_RECENT_S = 60
+INDEX_PROBE_DEPTH = 20
+
+WHEEL_FILE_RE = re.compile(
+    r"^ray-(?P<version>.+)-cp37-cp37m-manylinux2014_x86_64\.whl$")
+
+
+def wheel_key(git_branch: str, git_commit: str, ray_version: str) -> str:
+    return f"{git_branch}/{git_commit}/" \
+           f"ray-{ray_version}-cp37-cp37m-manylinux2014_x86_64.whl"
+
+
+class WheelStorage:
+    """Storage holding wheels under ``<branch>/<commit>/<wheel file>``."""
+
+    def list_keys(self, prefix: str) -> Iterator[str]:
+        raise NotImplementedError
+
+    def exists(self, key: str) -> bool:
+        raise NotImplementedError
+
+    def url(self, key: str) -> str:
+        raise NotImplementedError
+
+    def name(self) -> str:
+        raise NotImplementedError
+
+
+class S3WheelStorage(WheelStorage):
+    def __init__(self,
+                 bucket: str = "ray-wheels",
+                 region: str = "us-west-2",
+                 client=None):
+        self.bucket = bucket
+        self.region = region
+        # The wheels bucket is public, so no credentials are needed
+        self.client = client or boto3.client(
+            "s3", region_name=region, config=Config(signature_version=UNSIGNED))
+
+    def list_keys(self, prefix: str) -> Iterator[str]:
+        paginator = self.client.get_paginator("list_objects_v2")
+        for page in paginator.paginate(Bucket=self.bucket, Prefix=prefix):
+            for obj in page.get("Contents", []):
+                yield obj["Key"]
+
+    def exists(self, key: str) -> bool:
+        try:
+            self.client.head_object(Bucket=self.bucket, Key=key)
+        except ClientError as e:
+            if e.response["Error"]["Code"] in ("404", "NoSuchKey", "NotFound"):
+                return False
+            raise
+        return True
+
+    def url(self, key: str) -> str:
+        return f"https://s3-{self.region}.amazonaws.com/{self.bucket}/{key}"
+
+    def name(self) -> str:
+        return f"s3://{self.bucket}"
+
+
+class LocalWheelStorage(WheelStorage):
+    def __init__(self, root: str):
+        self.root = os.path.abspath(os.path.expanduser(root))
+
+    def list_keys(self, prefix: str) -> Iterator[str]:
+        for dirpath, _, filenames in os.walk(os.path.join(self.root, prefix)):
+            for filename in filenames:
+                path = os.path.join(dirpath, filename)
+                yield os.path.relpath(path, self.root).replace(os.sep, "/")
+
+    def exists(self, key: str) -> bool:
+        return os.path.isfile(self.url(key))
+
+    def url(self, key: str) -> str:
+        return os.path.join(self.root, key)
+
+    def name(self) -> str:
+        return self.root
+
+
+def default_wheel_storage() -> WheelStorage:
+    local_dir = os.environ.get("RELEASER_WHEEL_DIR")
+    if local_dir:
+        return LocalWheelStorage(local_dir)
+    return S3WheelStorage()
+
+
+class WheelIndex:
+    """Map of commit -> {ray_version: key} for one branch of a storage."""
+
+    def __init__(self,
+                 storage: WheelStorage,
+                 git_branch: str,
+                 cache_dir: str = CACHE_DIR,
+                 max_age: float = INDEX_MAX_AGE_S):
+        self.storage = storage
+        self.git_branch = git_branch
+        self.max_age = max_age
+
+        key = json.dumps([storage.name(), git_branch])
+        self.cache_file = os.path.join(
+            cache_dir, "wheel_index",
+            hashlib.sha256(key.encode()).hexdigest() + ".json")
+
+        self._wheels: Optional[Dict[str, Dict[str, str]]] = None
+        self._built_at = 0.
+
+    def _load_cached(self, max_age: Optional[float] = None
+                     ) -> Optional[Dict[str, Dict[str, str]]]:
+        if max_age is None:
+            max_age = self.max_age
+        try:
+            with open(self.cache_file, "rt") as f:
+                cached = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if time.time() - cached.get("built_at", 0) > max_age:
+            return None
+        self._built_at = cached["built_at"]
+        return cached["wheels"]
+
+    def _store_cached(self, wheels: Dict[str, Dict[str, str]],
+                      built_at: float):
+        try:
+            write_json(self.cache_file, {
+                "built_at": built_at,
+                "wheels": wheels
+            })
+        except OSError as e:
+            logger.warning(f"Could not write wheel index cache "
+                           f"{self.cache_file}: {e}")
+
+    def refresh(self) -> Dict[str, Dict[str, str]]:
+        """List the branch prefix and rebuild the index."""
+        prefix = f"{self.git_branch}/"
+        logger.info(f"Listing wheels under {self.storage.name()}/{prefix}")
+        built_at = time.time()
+
+        wheels: Dict[str, Dict[str, str]] = {}
+        for key in self.storage.list_keys(prefix):
+            parts = key[len(prefix):].split("/")
+            if len(parts) != 2:
+                continue
+            commit, filename = parts
+            match = WHEEL_FILE_RE.match(filename)
+            if match:
+                wheels.setdefault(commit, {})[match.group("version")] = key
+
+        logger.info(f"Indexed wheels for {len(wheels)} commits")
+        self._store_cached(wheels, built_at)
+        self._wheels = wheels
+        self._built_at = built_at
+        return wheels
+
+    def _load_or_refresh(self, max_age: float):
+        """Use the cached index if it is younger than `max_age`, or refresh.
+
+        Steps sharing the cache dir start at the same time, so the check
+        and refresh hold a file lock. Only one step lists the bucket and
+        the others use its result.
+        """
+        os.makedirs(os.path.dirname(self.cache_file), exist_ok=True)
+        with open(f"{self.cache_file}.lock", "wt") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                wheels = self._load_cached(max_age)
+                if wheels is None:
+                    self.refresh()
+                else:
+                    self._wheels = wheels
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    @property
+    def wheels(self) -> Dict[str, Dict[str, str]]:
+        if self._wheels is None:
+            self._wheels = self._load_cached()
+        if self._wheels is None:
+            self._load_or_refresh(self.max_age)
+        return self._wheels
+
+    def _lookup(self, candidates: List[Tuple[str, str]]) -> Optional[int]:
+        wheels = self.wheels
+        for i, (commit, version) in enumerate(candidates):
+            if version in wheels.get(commit, {}):
+                return i
+        return None
+
+    def _probe(self, commit: str, ray_version: str) -> bool:
+        return self.storage.exists(
+            wheel_key(self.git_branch, commit, ray_version))
+
+    def latest(self, candidates: List[Tuple[str, str]]
+               ) -> Optional[Tuple[str, str]]:
+        """Return the newest ``(commit, ray_version)`` that has a wheel.
+
+        `candidates` must be ordered newest first. Wheels for candidates
+        newer than the index's newest match may have been uploaded since
+        the index was built. Unless the index is younger than
+        `INDEX_RECENT_S`, the newest `INDEX_PROBE_DEPTH` of them are
+        probed in the storage. Older candidates are answered by the index.
+        """
+        i = self._lookup(candidates)
+        newer = candidates[:len(candidates) if i is None else i]
+        if newer and time.time() - self._built_at > INDEX_RECENT_S:
+            found = find_latest_wheel(
+                self.git_branch, newer[:INDEX_PROBE_DEPTH], probe=self._probe)
+            if found:
+                commit, version = found
+                self._wheels.setdefault(commit, {})[version] = wheel_key(
+                    self.git_branch, commit, version)
+                return commit, version
+        return None if i is None else tuple(candidates[i])
+
+    def url(self, commit: str, ray_version: str) -> str:
+        return self.storage.url(self.wheels[commit][ray_version])
+
+
+def find_latest_indexed_wheel(git_branch: str,
+                              candidates: List[Tuple[str, str]]
+                              ) -> Optional[Tuple[str, str, str]]:
+    """Return ``(commit, ray_version, url)`` of the newest wheel.
+
+    The answer comes from the wheel index. If the storage can't be listed
+    (e.g. no network access to the bucket API), we fall back to probing
+    wheel URLs with `find_latest_wheel_deep`.
+    """
+    try:
+        index = WheelIndex(default_wheel_storage(), git_branch)
+        found = index.latest(candidates)
+        if not found:
+            return None
+        commit, version = found
+        return commit, version, index.url(commit, version)
+    except (BotoCoreError, ClientError, OSError) as e:
+        logger.warning(f"Could not build wheel index, falling back to "
+                       f"probing wheel URLs: {e}")
+
+    found = find_latest_wheel_deep(git_branch, candidates, cache=WheelCache())
+    if not found:
+        return None
+    commit, version = found
+    return commit, version, wheel_url(version, git_branch, commit)
@@ -0,0 +1,312 @@
+"""
+Helpers for locating Ray wheels built by CI.
+
+Wheels for a commit are uploaded to
+
+    s3://ray-wheels/<branch>/<commit>/ray-<version>-cp37-...whl
+
+and are publicly readable over HTTPS. Finding the "latest commit with a
+wheel" is a matter of probing the candidate commits (newest first) and
+picking the first one that exists.
+
+A wheel never disappears once it has been uploaded, so positive answers
+are cached on disk forever. Negative answers only live for a short TTL,
+since the wheel builder may still be catching up.
+"""
+import hashlib
+import json
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import Any, Callable, List, Optional, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from cache_files import CACHE_DIR, write_json
+
+logger = logging.getLogger(__name__)
+
+# Number of concurrent HEAD requests when probing candidate commits.
+PROBE_WORKERS = 10
+
+# Seconds to wait for a single HEAD request.
+PROBE_TIMEOUT = 10
+
+# Maximum number of commits to search back for a wheel.
+SEARCH_DEPTH = int(os.environ.get("RELEASER_WHEEL_SEARCH_DEPTH", "500"))
+
+# Seconds after which a cached "no wheel" answer is probed again.
+NEGATIVE_TTL_S = int(os.environ.get("RELEASER_WHEEL_NEGATIVE_TTL", "300"))
+
+
+class WheelCache:
+    """On-disk cache of wheel availability.
+
+    Entries are keyed by (branch, commit, ray_version) and stored as one
+    small JSON file each, so concurrent processes sharing the cache dir
+    never have to merge writes.
+    """
+
+    def __init__(self,
+                 cache_dir: str = CACHE_DIR,
+                 negative_ttl: float = NEGATIVE_TTL_S):
+        self.cache_dir = os.path.join(cache_dir, "wheels")
+        self.negative_ttl = negative_ttl
+
+    def _path(self, ray_version: str, git_branch: str, git_commit: str):
+        key = json.dumps([git_branch, git_commit, ray_version])
+        return os.path.join(self.cache_dir,
+                            hashlib.sha256(key.encode()).hexdigest())
+
+    def get(self, ray_version: str, git_branch: str,
+            git_commit: str) -> Optional[bool]:
+        """Return the cached answer, or None if unknown or expired."""
+        path = self._path(ray_version, git_branch, git_commit)
+        try:
+            with open(path, "rt") as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+
+        if entry.get("exists"):
+            return True
+        if time.time() - entry.get("checked_at", 0) < self.negative_ttl:
+            return False
+        return None
+
+    def put(self, ray_version: str, git_branch: str, git_commit: str,
+            exists: bool):
+        path = self._path(ray_version, git_branch, git_commit)
+        entry = {
+            "branch": git_branch,
+            "commit": git_commit,
+            "ray_version": ray_version,
+            "exists": exists,
+            "checked_at": time.time(),
+        }
+        try:
+            write_json(path, entry)
+        except OSError as e:
+            logger.warning(f"Could not write wheel cache entry {path}: {e}")
+
+
+def wheel_url(ray_version, git_branch, git_commit):
+    return f"https://s3-us-west-2.amazonaws.com/ray-wheels/" \
+           f"{git_branch}/{git_commit}/" \
+           f"ray-{ray_version}-cp37-cp37m-manylinux2014_x86_64.whl"
+
+
+def wheel_exists(ray_version,
+                 git_branch,
+                 git_commit,
+                 session: Optional[requests.Session] = None):
+    url = wheel_url(ray_version, git_branch, git_commit)
+    http = session or requests
+    return http.head(url, timeout=PROBE_TIMEOUT).status_code == 200
+
+
+def cached_wheel_exists(ray_version,
+                        git_branch,
+                        git_commit,
+                        session: Optional[requests.Session] = None,
+                        cache: Optional[WheelCache] = None):
+    """Like `wheel_exists`, but consult and update `cache` first."""
+    if cache is not None:
+        exists = cache.get(ray_version, git_branch, git_commit)
+        if exists is not None:
+            return exists
+
+    exists = wheel_exists(ray_version, git_branch, git_commit, session)
+    if cache is not None:
+        cache.put(ray_version, git_branch, git_commit, exists)
+    return exists
+
+
+def pooled_session(pool_size: int = PROBE_WORKERS) -> requests.Session:
+    """Return a session that keeps up to `pool_size` connections alive.
+
+    All probes go to the same host, so a single pool lets concurrent
+    HEAD requests share TCP/TLS connections instead of opening one each.
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def _newest_decided(candidates: List[Any], found: List[Optional[bool]]):
+    """Check if the newest candidate with a wheel is already known.
+
+    Returns a tuple ``(decided, candidate)``. The answer is certain once
+    every candidate newer than the first positive probe came back negative.
+    """
+    for candidate, exists in zip(candidates, found):
+        if exists is None:
+            return False, None
+        if exists:
+            return True, candidate
+    return True, None
+
+
+def find_latest_wheel(git_branch: str,
+                      candidates: List[Tuple[str, str]],
+                      max_workers: int = PROBE_WORKERS,
+                      cache: Optional[WheelCache] = None,
+                      probe: Optional[Callable[[str, str], bool]] = None
+                      ) -> Optional[Tuple[str, str]]:
+    """Probe all `candidates` concurrently and return the newest with a wheel.
+
+    `candidates` are ``(commit, ray_version)`` tuples ordered newest first.
+    Probes run in parallel over a single pooled HTTP session. As soon as
+    the result is certain (i.e. a commit has a wheel and all newer commits
+    have none), outstanding probes are cancelled and the matching
+    candidate is returned.
+
+    If a `cache` is passed, cached answers are used first and only the
+    remaining commits are probed. A probe that fails with a connection
+    error counts as "no wheel" and is not cached.
+
+    By default, a probe is a HEAD request for the wheel URL. `probe` can
+    replace it with a ``probe(commit, ray_version) -> bool`` function.
+    """
+    if not candidates:
+        return None
+
+    found: List[Optional[bool]] = [None] * len(candidates)
+    if cache is not None:
+        found = [
+            cache.get(version, git_branch, commit)
+            for commit, version in candidates
+        ]
+        decided, candidate = _newest_decided(candidates, found)
+        if decided:
+            return candidate
+
+    unknown = [i for i, exists in enumerate(found) if exists is None]
+    max_workers = max(1, min(max_workers, len(unknown)))
+
+    session = None
+    if probe is None:
+        session = pooled_session(max_workers)
+
+        def probe(commit: str, version: str) -> bool:
+            return cached_wheel_exists(version, git_branch, commit, session,
+                                       cache)
+
+    executor = ThreadPoolExecutor(max_workers=max_workers)
+    try:
+        pending = {}
+        for i in unknown:
+            commit, version = candidates[i]
+            future = executor.submit(probe, commit, version)
+            pending[future] = i
+
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                i = pending.pop(future)
+                try:
+                    found[i] = future.result()
+                except requests.RequestException as e:
+                    logger.warning(f"Could not probe wheel for commit "
+                                   f"{candidates[i][0]}: {e}")
+                    found[i] = False
+
+            decided, candidate = _newest_decided(candidates, found)
+            if decided:
+                for future in pending:
+                    future.cancel()
+                return candidate
+        return None
+    finally:
+        # Don't block on probes that are already in flight. They are bounded
+        # by PROBE_TIMEOUT and their results are discarded.
+        executor.shutdown(wait=False)
+        if session is not None:
+            session.close()
+
+
+def gallop_latest_wheel(git_branch: str,
+                        candidates: List[Tuple[str, str]],
+                        cache: Optional[WheelCache] = None
+                        ) -> Optional[Tuple[str, str]]:
+    """Find the newest candidate with a wheel in O(log n) probes.
+
+    `candidates` are ``(commit, ray_version)`` tuples ordered newest first.
+    We gallop backwards in exponentially larger steps until a commit with
+    a wheel is found and then bisect the last step for the newest one.
+
+    This assumes the commits without wheels are the most recent ones,
+    which is the case when the wheel builder lags behind. If single older
+    builds failed, a wheel is still returned, but maybe not the newest.
+    """
+    with pooled_session(1) as session:
+        return _gallop(git_branch, candidates, session, cache)
+
+
+def _gallop(git_branch: str, candidates: List[Tuple[str, str]],
+            session: requests.Session, cache: Optional[WheelCache]
+            ) -> Optional[Tuple[str, str]]:
+    num_probes = 0
+
+    def has_wheel(i: int) -> bool:
+        nonlocal num_probes
+        num_probes += 1
+        commit, version = candidates[i]
+        try:
+            return cached_wheel_exists(version, git_branch, commit, session,
+                                       cache)
+        except requests.RequestException as e:
+            logger.warning(f"Could not probe wheel for commit {commit}: {e}")
+            return False
+
+    # Invariant: candidates[lo] has no wheel (or lo is -1),
+    # candidates[hi] has a wheel.
+    lo = -1
+    hi = None
+    step = 1
+    while hi is None:
+        i = min(lo + step, len(candidates) - 1)
+        if i <= lo:
+            logger.info(f"No wheel found in {len(candidates)} commits "
+                        f"after {num_probes} probes")
+            return None
+        if has_wheel(i):
+            hi = i
+        else:
+            lo = i
+            step *= 2
+
+    while hi - lo > 1:
+        mid = (lo + hi) // 2
+        if has_wheel(mid):
+            hi = mid
+        else:
+            lo = mid
+
+    logger.info(f"Found wheel for commit {candidates[hi][0]} after "
+                f"{num_probes} probes")
+    return candidates[hi]
+
+
+def find_latest_wheel_deep(git_branch: str,
+                           candidates: List[Tuple[str, str]],
+                           window: int = PROBE_WORKERS,
+                           cache: Optional[WheelCache] = None
+                           ) -> Optional[Tuple[str, str]]:
+    """Probe the newest `window` candidates, then search deeper.
+
+    The first window is probed concurrently with `find_latest_wheel`. Only
+    if it holds no wheel, the rest of `candidates` is searched with
+    `gallop_latest_wheel`.
+    """
+    found = find_latest_wheel(git_branch, candidates[:window], cache=cache)
+    if found or len(candidates) <= window:
+        return found
+
+    logger.info(f"No wheel in the latest {window} commits, searching up to "
+                f"{len(candidates)} commits deep")
+    return gallop_latest_wheel(git_branch, candidates[window:], cache=cache)